@@ -1,25 +1,42 @@
 import os
 import json
+import asyncio
+import argparse
 import logging
+import traceback
 import nodriver as uc
-from archiver_packages.utilities.nodriver_utils import nodriver_setup, random_delay
-from archiver_packages.utilities.file_utils import (
-    move_file,
-    create_directory,
-    list_files_by_creation_date,
-    extract_filename_without_extension,
-)
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable
+from archiver_packages.utilities.nodriver_utils import random_delay
+from archiver_packages.utilities.browser_manager import start_browser, stop_browser, LAUNCH
 from archiver_packages.youtube.download_video import (
-    download_videos_with_info,
-    get_youtube_links_from_playlist_and_channel,
+    download_video_with_info,
+    expand_youtube_links,
+    get_comment_download_options,
     input_youtube_links,
 )
 from archiver_packages.utilities.archiver_utils import (
     create_directory_with_timestamp,
     chrome_version_exception,
-    rename_filename_to_id,
+    organize_downloaded_file,
+    find_downloaded_file,
+    load_info_json,
+)
+from archiver_packages.utilities.archive_index import ArchiveIndex
+from archiver_packages.utilities.process_pool import start_process_pool, shutdown_process_pool
+from archiver_packages.utilities.journal import ArchiveJournal, QUEUED, DOWNLOADED, MOVED, JOURNAL_FILENAME
+from archiver_packages.utilities.metrics import (
+    RunMetrics,
+    YtDlpMetricsLogger,
+    measure_stage,
+    DOWNLOAD,
+    MOVE,
+    BYTES_DOWNLOADED,
 )
-from archiver_packages.youtube.youtube_to_html import parse_to_html
+from archiver_packages.utilities.asset_localizer import AssetLocalizer
+from archiver_packages.utilities.image_cache import ImageCache
+from archiver_packages.youtube.youtube_to_html import parse_to_html, video_to_html, copy_html_assets
+from archiver_packages.youtube.metadata_cache import MetadataCache
 
 logging.basicConfig(level=logging.INFO)
 
@@ -30,6 +47,132 @@ def load_settings() -> dict:
         return json.load(f)
 
 
+async def start_driver(profile: str, browser: str, headless: bool, browser_options: dict | None = None):
+    """Start or attach to the nodriver browser, returning None if it could not be started."""
+    try:
+        return await start_browser(profile, browser, headless, **(browser_options or {}))
+    except Exception as e:
+        logging.error(e)
+        if "only supports Chrome version" in str(e):
+            chrome_version_exception(str(e))
+        return None
+
+
+def prepare_video(
+    yt_url: str,
+    output_directory: str,
+    journal: ArchiveJournal,
+    download_options: dict | None = None,
+    metadata_cache: MetadataCache | None = None,
+    metrics: RunMetrics | None = None,
+    test_code: bool = False,
+    skip_download: bool = False
+) -> tuple | None:
+    """
+    Download a video and move its files into their own directory, skipping the stages the journal marks as done.
+    Return (yt_url, file, info), or None if the video could not be prepared.
+    """
+    video_metrics = metrics.video(yt_url) if metrics is not None else None
+    info = None
+    downloaded = journal.get(yt_url, DOWNLOADED)
+    if downloaded:
+        info = load_info_json(output_directory, downloaded["video_id"])
+    if info is None:
+        if video_metrics is not None:
+            download_options = {**(download_options or {}), 'logger': YtDlpMetricsLogger(video_metrics)}
+        try:
+            with measure_stage(video_metrics, DOWNLOAD):
+                info = download_video_with_info(yt_url, output_directory, skip_download, download_options, metadata_cache)
+        except Exception as e:
+            logging.error(f"Error downloading {yt_url}: {e}\n{traceback.format_exc()}")
+            return None
+        journal.record(yt_url, DOWNLOADED, video_id=info.get("id"))
+
+    if test_code and skip_download:
+        return yt_url, "", info
+
+    moved = journal.get(yt_url, MOVED)
+    if moved:
+        return yt_url, moved["file"], info
+    with measure_stage(video_metrics, MOVE):
+        file = find_downloaded_file(output_directory, info.get("id"))
+        if file is None:
+            logging.error(f"No downloaded file found for {yt_url}")
+            return None
+        file = organize_downloaded_file(file, output_directory)
+    journal.record(yt_url, MOVED, file=file)
+    if video_metrics is not None and os.path.isfile(file):
+        video_metrics.count(BYTES_DOWNLOADED, os.path.getsize(file))
+    return yt_url, file, info
+
+
+async def download_producer(
+    yt_urls: Iterable[str],
+    output_directory: str,
+    queue: asyncio.Queue,
+    journal: ArchiveJournal,
+    download_workers: int,
+    consumers: int = 1,
+    download_options: dict | None = None,
+    metadata_cache: MetadataCache | None = None,
+    metrics: RunMetrics | None = None,
+    test_code: bool = False,
+    skip_download: bool = False
+) -> None:
+    """
+    Download videos and put each (yt_url, file, info) on the queue as soon as its files land.
+    yt_urls may be a lazy iterable, downloads start while the rest is still being listed.
+    One None per consumer marks the end of the stream.
+    """
+    loop = asyncio.get_running_loop()
+
+    async def prepare(executor: ThreadPoolExecutor, yt_url: str) -> None:
+        item = await loop.run_in_executor(
+            executor, prepare_video, yt_url, output_directory, journal, download_options, metadata_cache, metrics,
+            test_code, skip_download
+        )
+        if item is not None:
+            await queue.put(item)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, download_workers)) as executor:
+            tasks = []
+            links = iter(yt_urls)
+            while (yt_url := await asyncio.to_thread(next, links, None)) is not None:
+                if not journal.is_done(yt_url, QUEUED):
+                    journal.record(yt_url, QUEUED)
+                tasks.append(asyncio.ensure_future(prepare(executor, yt_url)))
+            await asyncio.gather(*tasks)
+    finally:
+        for _ in range(consumers):
+            await queue.put(None)
+
+
+async def scrape_consumer(
+    queue: asyncio.Queue,
+    output_directory: str,
+    driver,
+    delay: Callable[[int], float],
+    save_comments: bool,
+    max_comments: int,
+    split_tabs: bool,
+    new_tab: bool = False,
+    comment_options: dict | None = None,
+    journal: ArchiveJournal | None = None,
+    html_options: dict | None = None,
+    metrics: RunMetrics | None = None,
+    asset_localizer: AssetLocalizer | None = None,
+    archive_index: ArchiveIndex | None = None
+) -> None:
+    """Scrape and render every downloaded video taken from the queue until the end marker."""
+    while (item := await queue.get()) is not None:
+        yt_url, file, info = item
+        await video_to_html(
+            output_directory, yt_url, file, info, driver, delay, save_comments, max_comments, split_tabs, new_tab,
+            comment_options, journal, html_options, metrics, asset_localizer, archive_index
+        )
+
+
 async def archiver(
     yt_urls: list[str],
     save_comments: bool,
@@ -39,84 +182,226 @@ async def archiver(
     split_tabs: bool,
     profile: str,
     browser: str,
+    download_workers: int = 1,
+    pipeline: bool = False,
+    max_tabs: int = 1,
+    comment_options: dict | None = None,
+    resume_directory: str | None = None,
+    incremental_sync: bool = False,
+    metadata_cache: MetadataCache | None = None,
+    html_options: dict | None = None,
+    browser_options: dict | None = None,
     # Optional parameters
     test_code: bool = False,
     skip_download: bool = False
 ) -> None:
     """
     Main archiver workflow: downloads videos, processes metadata, and generates HTML output.
+    With resume_directory, the videos of that earlier run are taken from its journal and
+    only their unfinished stages are run.
+    With incremental_sync, playlists and channels only yield videos missing from the archive index,
+    which sits next to the output directory and records every fully archived video.
+    metadata_cache holds the info dicts already fetched for the link preview, so they are not extracted twice.
+    With html_options "shared_assets", the assets and styles folders are copied once to the output directory.
+    With html_options "localize_images", the remote images of each page are saved next to it,
+    linked from the shared image cache in "image_cache_dir" if set.
+    Per-stage timings and counters are written to metrics.jsonl and metrics.prom in the output directory.
+    browser_options selects how the browser is started (launched, attached to or kept running as a daemon).
     """
 
     delay = random_delay(delay)
+    comment_options = comment_options or {}
+    browser_options = browser_options or {}
+    # Let yt-dlp extract the comments into the info dict when they are rendered from it
+    download_options = None
+    if save_comments and comment_options.get("comment_source") == "info_json":
+        download_options = get_comment_download_options(max_comments)
 
-    output_directory = create_directory_with_timestamp()
-    logging.info("Downloading videos...")
+    if resume_directory:
+        # A mistyped directory would otherwise resume no videos without notice
+        if not os.path.isdir(resume_directory):
+            raise FileNotFoundError(f"Resume directory not found: {resume_directory}")
+        if not os.path.isfile(os.path.join(resume_directory, JOURNAL_FILENAME)):
+            raise FileNotFoundError(f"No {JOURNAL_FILENAME} in {resume_directory}, it is not an archive run to resume")
+        output_directory = resume_directory
+        journal = ArchiveJournal(output_directory)
+        archive_index = ArchiveIndex(output_directory) if incremental_sync else None
+        yt_urls = journal.queued_urls()
+        logging.info(f"Resuming {len(yt_urls)} videos in {output_directory}...")
+    else:
+        output_directory = create_directory_with_timestamp()
+        journal = ArchiveJournal(output_directory)
+        # The archive index sits next to the output directories and is only kept for incremental syncs
+        archive_index = ArchiveIndex(output_directory) if incremental_sync else None
+        logging.info("Downloading videos...")
 
-    # Extract yt urls from playlists and channels
-    for yt_url in yt_urls[:]:
-        if "&list=" in yt_url or "/@" in yt_url:
-            extracted_urls = get_youtube_links_from_playlist_and_channel(yt_url)
-            yt_urls.remove(yt_url)
-            yt_urls.extend(extracted_urls)
+        # Extract yt urls from playlists and channels, lazily so the pipeline can start downloading
+        yt_urls = expand_youtube_links(yt_urls, archive_index.ids if archive_index is not None else None)
 
-    info_list = download_videos_with_info(yt_urls, output_directory, skip_download=skip_download)
-
-    if test_code and skip_download:
-        files = [""]
-    else:
-        files = list_files_by_creation_date(output_directory, except_extensions=[".json"])
-        files_updated = []
-        for file in files:
-            filename_without_extension = extract_filename_without_extension(file)
-            html_dir = f"{output_directory}/{filename_without_extension}"
-            create_directory(html_dir)
-            move_file(file, html_dir)
-            file_output_dir = f"{html_dir}/{filename_without_extension}.mp4"
-            file_output_dir = rename_filename_to_id(filename_without_extension, html_dir, file_output_dir)
-            files_updated.append(file_output_dir)
-            for f in os.listdir(output_directory):
-                f_path = f"{output_directory}/{f}"
-                if filename_without_extension in f and f.endswith(".json"):
-                    move_file(f_path, html_dir)
-        files = files_updated
+    html_options = html_options or {}
+    if html_options.get("shared_assets"):
+        copy_html_assets(output_directory)
 
+    # Stage timings and counters are written to the output directory
+    metrics = RunMetrics(output_directory)
+    # An attached or daemon browser is driven through tabs of its own, its existing tabs are never navigated
+    browser_mode = browser_options.get("browser_mode", LAUNCH)
+    dedicated_tabs = browser_mode != LAUNCH
+    # Remote images of the pages are downloaded over one pooled session for the whole run
+    asset_localizer = None
+    if html_options.get("localize_images"):
+        # Images are shared with earlier runs through the image cache
+        image_cache = None
+        if html_options.get("image_cache_dir"):
+            image_cache = ImageCache(
+                html_options["image_cache_dir"], html_options.get("image_cache_max_mb", 1024) * 1024 * 1024
+            )
+        asset_localizer = AssetLocalizer(html_options.get("image_download_workers", 8), image_cache)
     try:
-        driver = await nodriver_setup(profile, browser, headless)
-    except Exception as e:
-        logging.error(e)
-        if "only supports Chrome version" in str(e):
-            chrome_version_exception(str(e))
-        return
+        if pipeline:
+            # Start the browser first so scraping overlaps with the remaining downloads
+            driver = await start_driver(profile, browser, headless, browser_options)
+            if driver is None:
+                return
+            # Every consumer drives its own tab, so max_tabs videos are scraped at once
+            consumers = max(1, max_tabs)
+            queue = asyncio.Queue()
+            await asyncio.gather(
+                download_producer(
+                    yt_urls, output_directory, queue, journal, download_workers, consumers, download_options,
+                    metadata_cache, metrics, test_code, skip_download
+                ),
+                *(
+                    scrape_consumer(
+                        queue, output_directory, driver, delay, save_comments, max_comments, split_tabs,
+                        consumers > 1 or dedicated_tabs,
+                        comment_options, journal, html_options, metrics, asset_localizer, archive_index
+                    )
+                    for _ in range(consumers)
+                ),
+            )
+            await stop_browser(driver, browser_mode)
+            logging.info("Completed.")
+            return
 
-    await parse_to_html(
-        output_directory, yt_urls, files, info_list, driver, delay, save_comments, max_comments, split_tabs
-    )
-    driver.stop()
-    logging.info("Completed.")
+        yt_urls = list(yt_urls)
+        for yt_url in yt_urls:
+            if not journal.is_done(yt_url, QUEUED):
+                journal.record(yt_url, QUEUED)
+
+        with ThreadPoolExecutor(max_workers=max(1, download_workers)) as executor:
+            items = executor.map(
+                lambda yt_url: prepare_video(
+                    yt_url, output_directory, journal, download_options, metadata_cache, metrics, test_code, skip_download
+                ),
+                yt_urls,
+            )
+            items = [item for item in items if item is not None]
+        yt_urls = [yt_url for yt_url, _, _ in items]
+        files = [file for _, file, _ in items]
+        info_list = [info for _, _, info in items]
+
+        driver = await start_driver(profile, browser, headless, browser_options)
+        if driver is None:
+            return
+
+        await parse_to_html(
+            output_directory, yt_urls, files, info_list, driver, delay, save_comments, max_comments, split_tabs, max_tabs,
+            comment_options, journal, html_options, metrics, asset_localizer, dedicated_tabs, archive_index
+        )
+        await stop_browser(driver, browser_mode)
+        logging.info("Completed.")
+
+    finally:
+        metrics.write_prometheus()
+        if asset_localizer is not None:
+            asset_localizer.close()
+        if metadata_cache is not None:
+            metadata_cache.save()
 
 
 if __name__ == "__main__":
 
+    parser = argparse.ArgumentParser(description="Archive YouTube videos with their metadata and comments.")
+    parser.add_argument(
+        "--resume",
+        metavar="DIR",
+        help="continue the unfinished stages of an earlier run in its youtube_downloads directory",
+    )
+    parser.add_argument(
+        "urls",
+        nargs="*",
+        help="YouTube video/playlist/channel URLs to archive without the interactive prompt",
+    )
+    args = parser.parse_args()
+
     settings = load_settings()
     save_comments = settings["youtube"]["save_comments"]
     max_comments = settings["youtube"]["max_comments"]
     download_playlist = settings["youtube"]["download_playlist"]
+    download_workers = settings["youtube"].get("download_workers", 1)
+    incremental_sync = settings["youtube"].get("incremental_sync", False)
+    metadata_cache = MetadataCache(
+        settings["youtube"].get("metadata_cache_file") or None,
+        settings["youtube"].get("metadata_cache_ttl", 3600),
+    )
+    pipeline = settings["extra"].get("pipeline", False)
+    max_tabs = settings["extra"].get("max_tabs", 1)
+    comment_options = {
+        "event_driven": settings["youtube"].get("event_driven_scroll", False),
+        "comment_source": settings["youtube"].get("comment_source", "dom"),
+        "batched_expansion": settings["youtube"].get("batched_reply_expansion", False),
+        "harvest": settings["youtube"].get("harvest_comments", False),
+    }
+    html_options = {
+        "shared_assets": settings["extra"].get("shared_assets", False),
+        "audio_mode": settings["youtube"].get("audio_mode", "download"),
+        "localize_images": settings["extra"].get("localize_images", False),
+        "image_download_workers": settings["extra"].get("image_download_workers", 8),
+        "image_cache_dir": settings["extra"].get("image_cache_dir") or None,
+        "image_cache_max_mb": settings["extra"].get("image_cache_max_mb", 1024),
+    }
     delay = settings["extra"]["delay"]
     headless = settings["extra"]["headless"]
     split_tabs = settings["extra"]["split_tabs"]
     profile = settings["extra"]["profile"]
     browser = settings["extra"]["browser"]
+    browser_options = {
+        "browser_mode": settings["extra"].get("browser_mode", "launch"),
+        "debugging_port": settings["extra"].get("debugging_port", 9222),
+        "daemon_profile_dir": settings["extra"].get("daemon_profile_dir") or None,
+        "daemon_headless": settings["extra"].get("daemon_headless", False),
+    }
 
-    yt_urls = input_youtube_links(download_playlist)
-    uc.loop().run_until_complete(
-        archiver(
-            yt_urls,
-            save_comments,
-            max_comments,
-            delay,
-            headless,
-            split_tabs,
-            profile,
-            browser,
+    if args.resume:
+        yt_urls = []
+    elif args.urls:
+        yt_urls = args.urls if download_playlist else [url.split("&")[0] for url in args.urls]
+    else:
+        yt_urls = input_youtube_links(download_playlist, metadata_cache)
+    # CPU-heavy post-processing runs in a process pool, one worker per core unless configured
+    start_process_pool(settings["extra"].get("post_processing_workers") or None)
+    try:
+        uc.loop().run_until_complete(
+            archiver(
+                yt_urls,
+                save_comments,
+                max_comments,
+                delay,
+                headless,
+                split_tabs,
+                profile,
+                browser,
+                download_workers,
+                pipeline,
+                max_tabs,
+                comment_options,
+                args.resume,
+                incremental_sync,
+                metadata_cache,
+                html_options,
+                browser_options,
+            )
         )
-    )
\ No newline at end of file
+    finally:
+        shutdown_process_pool()
@@ -0,0 +1,35 @@
+# Local index of the video IDs archived by every run, used for incremental channel/playlist syncs
+import os
+import threading
+
+ARCHIVE_INDEX_FILENAME = "archived_ids.txt"
+
+
+class ArchiveIndex:
+    """
+    Index of the IDs of the videos archived so far, one per line in a file next to the output directories of the runs.
+    Every ID is recorded once, however many runs archive the video again.
+    """
+
+    def __init__(self, output_directory: str):
+        # The output directories of all runs share their parent directory, the archive
+        self.path = os.path.join(os.path.dirname(os.path.abspath(output_directory)), ARCHIVE_INDEX_FILENAME)
+        self.lock = threading.Lock()
+        self.ids: set[str] = set()
+        self.load()
+
+    def load(self) -> None:
+        """Load the IDs of the index file, if any."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            self.ids = {line.strip() for line in f if line.strip()}
+
+    def add(self, video_id: str) -> None:
+        """Append a video ID to the index file, unless it is already recorded."""
+        with self.lock:
+            if video_id in self.ids:
+                return
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(f"{video_id}\n")
+            self.ids.add(video_id)
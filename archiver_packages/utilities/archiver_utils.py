@@ -1,7 +1,14 @@
 # Utility functions for the main archiver logic
 import os
 import re
+import json
 from archiver_packages.utilities.utilities import clear
+from archiver_packages.utilities.file_utils import (
+    move_file,
+    create_directory,
+    list_files_by_creation_date,
+    extract_filename_without_extension,
+)
 from datetime import datetime
 
 
@@ -30,12 +37,60 @@ def chrome_version_exception(exception: str) -> None:
     exit()
 
 
+def extract_id_from_filename(filename_without_extension: str) -> str | None:
+    """Extract the video ID from a filename (always use the last [id] in the filename)."""
+    matches = re.findall(r'\[([a-zA-Z0-9_-]+)\]', filename_without_extension)
+    return matches[-1] if matches else None
+
+
 def rename_filename_to_id(filename_without_extension: str, html_dir: str, file_output_dir: str) -> str:
     """Rename a file to use its ID as the filename (always use the last [id] in the filename)."""
-    matches = re.findall(r'\[([a-zA-Z0-9_-]+)\]', filename_without_extension)
-    if not matches:
+    file_id = extract_id_from_filename(filename_without_extension)
+    if file_id is None:
         return file_output_dir
-    file_id = matches[-1]  # Use the last match
     new_filename = f"{html_dir}/{file_id}.mp4"
     os.rename(file_output_dir, new_filename)
-    return new_filename
\ No newline at end of file
+    return new_filename
+
+
+def organize_downloaded_file(file: str, output_directory: str) -> str:
+    """Move a downloaded video and its JSON files into their own directory and return the new video path."""
+    filename_without_extension = extract_filename_without_extension(file)
+    html_dir = f"{output_directory}/{filename_without_extension}"
+    create_directory(html_dir)
+    move_file(file, html_dir)
+    file_output_dir = f"{html_dir}/{filename_without_extension}.mp4"
+    file_output_dir = rename_filename_to_id(filename_without_extension, html_dir, file_output_dir)
+    for f in os.listdir(output_directory):
+        f_path = f"{output_directory}/{f}"
+        if filename_without_extension in f and f.endswith(".json"):
+            move_file(f_path, html_dir)
+    return file_output_dir
+
+
+# Files yt-dlp leaves next to a video while (or after failing) downloading it
+PARTIAL_DOWNLOAD_EXTENSIONS = (".part", ".ytdl", ".temp")
+
+
+def find_downloaded_file(output_directory: str, video_id: str) -> str | None:
+    """
+    Find the downloaded (non-JSON) file of a video by the [id] its filename ends with.
+    Files are matched by ID only, never by creation order, as parallel downloads finish in any order.
+    Partial and per-format files (e.g. "Title [id].f137.mp4" or ".part" files left by an interrupted run) are skipped.
+    """
+    for file in list_files_by_creation_date(output_directory, except_extensions=[".json"]):
+        if file.endswith(PARTIAL_DOWNLOAD_EXTENSIONS):
+            continue
+        if extract_filename_without_extension(file).endswith(f"[{video_id}]"):
+            return file
+    return None
+
+
+def load_info_json(output_directory: str, video_id: str) -> dict | None:
+    """Load the yt-dlp info JSON of a video from anywhere under the output directory."""
+    for root, _, filenames in os.walk(output_directory):
+        for filename in filenames:
+            if filename.endswith(f"[{video_id}].info.json"):
+                with open(os.path.join(root, filename), encoding="utf-8") as f:
+                    return json.load(f)
+    return None
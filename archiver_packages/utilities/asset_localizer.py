@@ -0,0 +1,130 @@
+# Download the remote images of an archived HTML page and point the page at the local copies
+import os
+import re
+import html
+import hashlib
+import logging
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from archiver_packages.utilities.file_utils import create_session
+from archiver_packages.utilities.image_cache import ImageCache
+
+IMAGES_DIRECTORY = "images"
+
+# src attribute of the <img> tags loading a remote image, one tag per line in the rendered pages
+REMOTE_IMAGE_PATTERN = re.compile(r'(<img\b[^>]*?\bsrc=")(https?://[^"]+)(")')
+
+IMAGE_EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "image/gif": ".gif",
+    "image/avif": ".avif",
+    "image/svg+xml": ".svg",
+}
+
+
+def image_extension(content_type: str) -> str:
+    """Return the file extension of an image content type."""
+    return IMAGE_EXTENSIONS.get(content_type.split(";")[0].strip().lower(), ".jpg")
+
+
+def image_filename(url: str, content_type: str) -> str:
+    """Return the local filename of an image, unique per URL."""
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()[:32] + image_extension(content_type)
+
+
+class AssetLocalizer:
+    """
+    Localizes the hotlinked images (commenter avatars, the channel avatar of the hearts...) of archived pages.
+    Images are fetched over one pooled keep-alive session shared by all videos of the run, with at most
+    max_workers downloads at a time. With an image cache, images already cached by earlier videos or runs
+    are linked from it instead of being downloaded again.
+    """
+
+    def __init__(self, max_workers: int = 8, image_cache: ImageCache | None = None):
+        self.session = create_session(pool_size=max_workers)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="asset-localizer")
+        self.image_cache = image_cache
+
+    def close(self) -> None:
+        """Wait for the running downloads, save the image cache index and close the pooled connections."""
+        self.executor.shutdown(wait=True)
+        if self.image_cache is not None:
+            self.image_cache.save()
+        self.session.close()
+
+    def fetch_image(self, url: str) -> tuple[bytes, str] | None:
+        """Return the content and content type of a remote image, or None if it could not be downloaded."""
+        try:
+            response = self.session.get(url, timeout=10)
+        except requests.RequestException as e:
+            logging.warning(f"Error downloading image {url}: {e}")
+            return None
+        content_type = response.headers.get("Content-Type", "")
+        if response.status_code != 200 or not content_type.startswith("image/"):
+            logging.warning(f"Error downloading image {url}. Status code: {response.status_code}, type: {content_type}")
+            return None
+        return response.content, content_type
+
+    def save_image(self, url: str, images_directory: str) -> str | None:
+        """Download an image to images_directory, returning its filename or None if it could not be downloaded."""
+        if self.image_cache is not None:
+            blob = self.image_cache.get(url, images_directory)
+            if blob is not None:
+                return blob
+        image = self.fetch_image(url)
+        if image is None:
+            return None
+        content, content_type = image
+        if self.image_cache is not None:
+            try:
+                return self.image_cache.put(url, content, image_extension(content_type), images_directory)
+            except OSError as e:
+                logging.warning(f"Error caching image {url}: {e}")
+        filename = image_filename(url, content_type)
+        try:
+            with open(os.path.join(images_directory, filename), "wb") as f:
+                f.write(content)
+        except OSError as e:
+            logging.warning(f"Error saving image {url}: {e}")
+            return None
+        return filename
+
+    def localize_html(self, html_path: str) -> int:
+        """
+        Download the remote images of an HTML file next to it and rewrite their references to the local copies.
+        Images that could not be downloaded keep their remote URL. The file is read line by line, so the
+        pages of videos with many comments are never held in memory.
+
+        Returns:
+            int: Number of localized images.
+        """
+        html_directory = os.path.dirname(html_path)
+        urls = set()
+        with open(html_path, encoding="utf8") as f:
+            for line in f:
+                urls.update(html.unescape(match.group(2)) for match in REMOTE_IMAGE_PATTERN.finditer(line))
+        if not urls:
+            return 0
+
+        images_directory = os.path.join(html_directory, IMAGES_DIRECTORY)
+        os.makedirs(images_directory, exist_ok=True)
+        filenames = dict(zip(urls, self.executor.map(lambda url: self.save_image(url, images_directory), urls)))
+
+        def local_src(match: re.Match) -> str:
+            filename = filenames.get(html.unescape(match.group(2)))
+            if filename is None:
+                return match.group(0)
+            return f"{match.group(1)}{IMAGES_DIRECTORY}/{filename}{match.group(3)}"
+
+        temp_path = f"{html_path}.tmp"
+        with open(html_path, encoding="utf8") as src, open(temp_path, "w", encoding="utf8") as dst:
+            for line in src:
+                dst.write(REMOTE_IMAGE_PATTERN.sub(local_src, line))
+        os.replace(temp_path, html_path)
+        if self.image_cache is not None:
+            self.image_cache.save()
+        localized = sum(filename is not None for filename in filenames.values())
+        logging.info(f"Localized {localized} of {len(urls)} images of {html_path}")
+        return localized
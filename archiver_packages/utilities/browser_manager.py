@@ -0,0 +1,122 @@
+# Lifecycle of the browser driven by the archiver: launched per run, attached to, or kept running as a daemon
+import os
+import sys
+import time
+import asyncio
+import logging
+import subprocess
+import requests
+import nodriver as uc
+from archiver_packages.utilities.nodriver_utils import nodriver_setup, get_browser_paths, BROWSER_ARGS
+
+LAUNCH = "launch"
+ATTACH = "attach"
+DAEMON = "daemon"
+BROWSER_MODES = (LAUNCH, ATTACH, DAEMON)
+
+DEBUGGING_HOST = "127.0.0.1"
+DEFAULT_DEBUGGING_PORT = 9222
+DAEMON_PROFILE_DIRECTORY = "browser_profile"
+
+
+def debugging_endpoint_ready(port: int, host: str = DEBUGGING_HOST) -> bool:
+    """Return whether a browser is listening on the remote debugging endpoint."""
+    try:
+        return requests.get(f"http://{host}:{port}/json/version", timeout=1).ok
+    except requests.RequestException:
+        return False
+
+
+def wait_for_debugging_endpoint(port: int, timeout: float = 30, host: str = DEBUGGING_HOST) -> bool:
+    """Wait until a browser is listening on the remote debugging endpoint, returning False on timeout."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if debugging_endpoint_ready(port, host):
+            return True
+        time.sleep(0.25)
+    return False
+
+
+def launch_daemon_browser(browser_executable_path: str, user_data_dir: str, port: int, headless: bool = False) -> int:
+    """
+    Start a browser detached from the archiver process, so it keeps running after the run ends.
+    Returns the pid of the browser.
+    """
+    args = [
+        browser_executable_path,
+        f"--remote-debugging-port={port}",
+        f"--user-data-dir={user_data_dir}",
+        *BROWSER_ARGS,
+        "--lang=en-US",
+    ]
+    if headless:
+        args.append("--headless=new")
+    if sys.platform == "win32":
+        detach = {"creationflags": subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP}
+    else:
+        detach = {"start_new_session": True}
+    process = subprocess.Popen(
+        args, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, **detach
+    )
+    return process.pid
+
+
+async def start_browser(
+    profile: str,
+    browser: str,
+    headless: bool,
+    browser_mode: str = LAUNCH,
+    debugging_port: int = DEFAULT_DEBUGGING_PORT,
+    daemon_profile_dir: str | None = None,
+    daemon_headless: bool = False,
+):
+    """
+    Start or connect to the browser driven by the archiver.
+
+    Args:
+        profile (str): Profile of the user's browser, used in launch mode.
+        browser (str): Browser name (Edge, Chrome or Brave).
+        headless (bool): Run a browser launched per run without a window.
+        browser_mode (str): "launch" closes the running browser and starts it with the user's profile, as before.
+            "attach" connects to a browser already listening on debugging_port.
+            "daemon" connects to the archiver's own browser on debugging_port, starting it first if it is not
+            running. The daemon is left running after the run, so later runs skip the browser start.
+        debugging_port (int): Remote debugging port of the attached or daemon browser.
+        daemon_profile_dir (str | None): User data directory of the daemon browser.
+        daemon_headless (bool): Start the daemon browser without a window. The daemon is started with a window
+            by default, independently of headless, so the user can sign in to its profile.
+
+    Returns:
+        uc.Browser | None: The nodriver browser, or None if the browser name is invalid.
+    """
+    if browser_mode == LAUNCH:
+        return await nodriver_setup(profile, browser, headless)
+    if browser_mode not in BROWSER_MODES:
+        raise ValueError(f"Invalid browser mode: {browser_mode} (expected one of {', '.join(BROWSER_MODES)})")
+
+    if not await asyncio.to_thread(debugging_endpoint_ready, debugging_port):
+        if browser_mode == ATTACH:
+            raise RuntimeError(
+                f"No browser is listening on port {debugging_port}, "
+                f"start it with --remote-debugging-port={debugging_port} or use the daemon browser mode"
+            )
+        browser_paths = get_browser_paths(browser)
+        if browser_paths is None:
+            return None
+        _, browser_executable_path, _ = browser_paths
+        user_data_dir = os.path.abspath(daemon_profile_dir or DAEMON_PROFILE_DIRECTORY)
+        pid = launch_daemon_browser(browser_executable_path, user_data_dir, debugging_port, daemon_headless)
+        logging.info(f"Started {browser} daemon (pid {pid}) on port {debugging_port} with profile {user_data_dir}")
+        if not await asyncio.to_thread(wait_for_debugging_endpoint, debugging_port):
+            raise RuntimeError(f"{browser} daemon did not open its debugging port {debugging_port}")
+
+    logging.info(f"Attaching to the browser on port {debugging_port}...")
+    return await uc.start(host=DEBUGGING_HOST, port=debugging_port)
+
+
+async def stop_browser(driver, browser_mode: str = LAUNCH) -> None:
+    """Stop a launched browser, or only disconnect from an attached or daemon browser, leaving it running."""
+    if browser_mode == LAUNCH:
+        driver.stop()
+    else:
+        await driver.connection.aclose()
@@ -3,6 +3,8 @@ import os
 import shutil
 import requests
 import logging
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import List
 
 
@@ -78,10 +80,23 @@ def extract_filename_without_extension(file_path: str) -> str:
     return filename_without_extension
 
 
-def download_file(thumbnail_url: str, save_path: str) -> None:
-    """Download a file from a URL and save it to a path."""
+def create_session(pool_size: int = 10, retries: int = 2) -> requests.Session:
+    """Create a requests session keeping up to pool_size connections per host alive, retrying failed requests."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=Retry(total=retries, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504)),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def download_file(thumbnail_url: str, save_path: str, session: requests.Session | None = None) -> None:
+    """Download a file from a URL and save it to a path, over the session's pooled connections if given."""
     try:
-        response = requests.get(thumbnail_url, timeout=10)
+        response = (session or requests).get(thumbnail_url, timeout=10)
         if response.status_code == 200:
             with open(save_path, 'wb') as f:
                 f.write(response.content)
@@ -89,4 +104,4 @@ def download_file(thumbnail_url: str, save_path: str) -> None:
         else:
             logging.error(f"Error downloading thumbnail. Status code: {response.status_code}")
     except requests.RequestException as e:
-        logging.error(f"Error downloading thumbnail: {e}")
\ No newline at end of file
+        logging.error(f"Error downloading thumbnail: {e}")
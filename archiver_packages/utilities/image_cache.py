@@ -0,0 +1,156 @@
+# Content-addressed image cache shared by all videos and runs
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+INDEX_FILENAME = "index.json"
+BLOBS_DIRECTORY = "blobs"
+
+# Hosts serving the same YouTube avatars and channel images
+YOUTUBE_IMAGE_HOSTS = {"yt3.googleusercontent.com": "yt3.ggpht.com"}
+
+
+def normalize_url(url: str) -> str:
+    """Return the cache key of an image URL: lowercase scheme and host, one host per image CDN, sorted query, no fragment."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    host = YOUTUBE_IMAGE_HOSTS.get(host, host)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), host, parts.path, query, ""))
+
+
+def link_file(source_path: str, destination_path: str) -> None:
+    """Hardlink a file, copying it where hardlinks are not supported (e.g. across drives)."""
+    if os.path.exists(destination_path):
+        return
+    try:
+        os.link(source_path, destination_path)
+    except OSError:
+        shutil.copyfile(source_path, destination_path)
+
+
+class ImageCache:
+    """
+    On-disk image cache keyed by normalized URL, storing every image once under the SHA-256 of its content.
+    Video folders get hardlinks to the cached blobs, so an avatar seen in hundreds of videos is downloaded and
+    stored once. When the blobs exceed max_bytes, the least recently used ones are evicted; pages linking to
+    them keep working, as their hardlinks still hold the data.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 1024 ** 3):
+        self.directory = directory
+        self.index_path = os.path.join(directory, INDEX_FILENAME)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.urls: dict[str, str] = {}
+        self.blobs: dict[str, dict] = {}
+        self.dirty = False
+        self.load()
+
+    def load(self) -> None:
+        """Load the index of the cache, dropping the blobs missing on disk."""
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning(f"Could not load image cache index {self.index_path}: {e}")
+            return
+        self.blobs = {
+            blob: entry for blob, entry in index.get("blobs", {}).items() if os.path.exists(self.blob_path(blob))
+        }
+        self.urls = {url: blob for url, blob in index.get("urls", {}).items() if blob in self.blobs}
+
+    def save(self) -> None:
+        """Write the index of the cache if it changed, replacing it atomically."""
+        with self.lock:
+            if not self.dirty:
+                return
+            index = {"urls": dict(self.urls), "blobs": dict(self.blobs)}
+            self.dirty = False
+        temp_path = f"{self.index_path}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(index, f)
+            os.replace(temp_path, self.index_path)
+        except OSError as e:
+            logging.warning(f"Could not save image cache index {self.index_path}: {e}")
+
+    def blob_path(self, blob: str) -> str:
+        """Return the path of a blob, sharded by the first two characters of its hash."""
+        return os.path.join(self.directory, BLOBS_DIRECTORY, blob[:2], blob)
+
+    def get(self, url: str, destination_directory: str) -> str | None:
+        """
+        Link the cached image of a URL into destination_directory, marking it as recently used.
+        Returns the blob name the image is linked as, or None if it is not cached.
+        """
+        key = normalize_url(url)
+        with self.lock:
+            blob = self.urls.get(key)
+            if blob is None:
+                return None
+            try:
+                link_file(self.blob_path(blob), os.path.join(destination_directory, blob))
+            except OSError:
+                # The blob was removed from disk outside of the cache
+                del self.urls[key]
+                self.blobs.pop(blob, None)
+                self.dirty = True
+                return None
+            self.blobs[blob]["last_used"] = time.time()
+            self.dirty = True
+            return blob
+
+    def put(self, url: str, content: bytes, extension: str, destination_directory: str) -> str:
+        """
+        Store the content of an image URL, once per distinct content, and link it into destination_directory.
+        Returns the blob name the image is linked as.
+        """
+        blob = hashlib.sha256(content).hexdigest() + extension
+        path = self.blob_path(blob)
+        with self.lock:
+            if blob not in self.blobs or not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                temp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(temp_path, "wb") as f:
+                    f.write(content)
+                os.replace(temp_path, path)
+                self.blobs[blob] = {"size": len(content)}
+            link_file(path, os.path.join(destination_directory, blob))
+            self.blobs[blob]["last_used"] = time.time()
+            self.urls[normalize_url(url)] = blob
+            self.dirty = True
+            self.evict(keep=blob)
+        return blob
+
+    def evict(self, keep: str) -> None:
+        """Remove the least recently used blobs until the cache fits in max_bytes, keeping the blob just stored."""
+        total = sum(entry["size"] for entry in self.blobs.values())
+        if total <= self.max_bytes:
+            return
+        evicted = set()
+        for blob, entry in sorted(self.blobs.items(), key=lambda item: item[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if blob == keep:
+                continue
+            try:
+                os.remove(self.blob_path(blob))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logging.warning(f"Could not evict cached image {blob}: {e}")
+                continue
+            total -= entry["size"]
+            evicted.add(blob)
+        for blob in evicted:
+            del self.blobs[blob]
+        self.urls = {url: blob for url, blob in self.urls.items() if blob not in evicted}
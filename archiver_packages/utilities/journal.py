@@ -0,0 +1,68 @@
+# Per-video state journal used to resume interrupted archive runs
+import os
+import json
+import logging
+import threading
+from datetime import datetime, timezone
+
+JOURNAL_FILENAME = "archive_journal.jsonl"
+
+# Stages a video goes through, in order
+QUEUED = "queued"
+DOWNLOADED = "downloaded"
+MOVED = "moved"
+SCRAPED = "scraped"
+COMMENTS_WRITTEN = "comments_written"
+AUDIO_EXTRACTED = "audio_extracted"
+
+
+class ArchiveJournal:
+    """
+    Append-only JSON lines journal of the stages each video of an archive run has completed.
+    Every line is one {"url", "stage", "timestamp", ...} record, so a crash loses at most the stage in progress.
+    """
+
+    def __init__(self, output_directory: str):
+        self.path = os.path.join(output_directory, JOURNAL_FILENAME)
+        self.lock = threading.Lock()
+        self.stages: dict[str, dict[str, dict]] = {}
+        self.load()
+
+    def load(self) -> None:
+        """Load the records of an existing journal file."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash can leave the last line half-written
+                    logging.warning(f"Ignoring invalid journal line {line_number} in {self.path}")
+                    continue
+                self.stages.setdefault(record["url"], {})[record["stage"]] = record
+
+    def record(self, yt_url: str, stage: str, **data) -> None:
+        """Record that a video completed a stage, with optional stage data."""
+        record = {
+            "url": yt_url,
+            "stage": stage,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            **data,
+        }
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.stages.setdefault(yt_url, {})[stage] = record
+
+    def is_done(self, yt_url: str, stage: str) -> bool:
+        """Return whether a video completed a stage."""
+        return stage in self.stages.get(yt_url, {})
+
+    def get(self, yt_url: str, stage: str) -> dict | None:
+        """Return the record of a completed stage, or None."""
+        return self.stages.get(yt_url, {}).get(stage)
+
+    def queued_urls(self) -> list[str]:
+        """Return the URLs of all videos of the run, in the order they were queued."""
+        return [yt_url for yt_url, stages in self.stages.items() if QUEUED in stages]
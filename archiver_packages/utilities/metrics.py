@@ -0,0 +1,174 @@
+# Per-stage timing and throughput metrics of an archive run
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from typing import ContextManager, Iterator
+
+METRICS_JSONL_FILENAME = "metrics.jsonl"
+METRICS_PROM_FILENAME = "metrics.prom"
+
+# Stages timed for each video
+DOWNLOAD = "download"
+MOVE = "move"
+SCRAPE_INFO = "scrape_info"
+LOAD_ALL_COMMENTS = "load_all_comments"
+EXPAND_ALL_COMMENTS = "expand_all_comments"
+HARVEST_COMMENTS = "harvest_comments"
+PARSE_RENDER = "parse_render"
+LOCALIZE_IMAGES = "localize_images"
+AUDIO = "audio"
+
+# Counters
+BYTES_DOWNLOADED = "bytes_downloaded"
+COMMENTS = "comments"
+REPLIES = "replies"
+RETRIES = "retries"
+
+COUNTER_HELP = {
+    BYTES_DOWNLOADED: "Bytes of downloaded video files.",
+    COMMENTS: "Comment threads saved.",
+    REPLIES: "Replies saved.",
+    RETRIES: "Download retries reported by yt-dlp.",
+}
+
+
+class RunMetrics:
+    """
+    Stage timings and counters of an archive run.
+    Every finished stage and counted event is appended to metrics.jsonl in the output directory as it happens,
+    and the run totals are written to metrics.prom in the Prometheus text format.
+    """
+
+    def __init__(self, output_directory: str):
+        self.jsonl_path = os.path.join(output_directory, METRICS_JSONL_FILENAME)
+        self.prom_path = os.path.join(output_directory, METRICS_PROM_FILENAME)
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.stage_seconds: dict[str, float] = {}
+        self.stage_runs: dict[str, int] = {}
+        self.stage_failures: dict[str, int] = {}
+        self.counters: dict[str, int] = {counter: 0 for counter in COUNTER_HELP}
+        self.videos: set[str] = set()
+
+    def write_record(self, record: dict) -> None:
+        """Append a record to the JSON lines file."""
+        record["timestamp"] = datetime.now(timezone.utc).isoformat()
+        try:
+            with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logging.warning(f"Could not write metrics to {self.jsonl_path}: {e}")
+
+    @contextmanager
+    def stage(self, yt_url: str, stage: str) -> Iterator[None]:
+        """Time a stage of a video, counting it as failed if it raises."""
+        started = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            seconds = time.perf_counter() - started
+            with self.lock:
+                self.videos.add(yt_url)
+                self.stage_seconds[stage] = self.stage_seconds.get(stage, 0) + seconds
+                self.stage_runs[stage] = self.stage_runs.get(stage, 0) + 1
+                if not ok:
+                    self.stage_failures[stage] = self.stage_failures.get(stage, 0) + 1
+                self.write_record({"type": "stage", "url": yt_url, "stage": stage, "seconds": round(seconds, 6), "ok": ok})
+
+    def count(self, yt_url: str, counter: str, value: int = 1) -> None:
+        """Add value to a counter of a video."""
+        with self.lock:
+            self.videos.add(yt_url)
+            self.counters[counter] = self.counters.get(counter, 0) + value
+            self.write_record({"type": "counter", "url": yt_url, "counter": counter, "value": value})
+
+    def video(self, yt_url: str) -> "VideoMetrics":
+        """Return the metrics of a single video of the run."""
+        return VideoMetrics(self, yt_url)
+
+    def write_prometheus(self) -> None:
+        """Write the run totals to the Prometheus text file, replacing it atomically."""
+        with self.lock:
+            lines = [
+                "# HELP archiver_run_seconds Wall time of the archive run.",
+                "# TYPE archiver_run_seconds gauge",
+                f"archiver_run_seconds {time.perf_counter() - self.started:.6f}",
+                "# HELP archiver_videos_total Videos processed by the archive run.",
+                "# TYPE archiver_videos_total counter",
+                f"archiver_videos_total {len(self.videos)}",
+                "# HELP archiver_stage_seconds_total Seconds spent in each stage, summed over all videos.",
+                "# TYPE archiver_stage_seconds_total counter",
+                *(f'archiver_stage_seconds_total{{stage="{stage}"}} {seconds:.6f}' for stage, seconds in self.stage_seconds.items()),
+                "# HELP archiver_stage_runs_total Times each stage ran.",
+                "# TYPE archiver_stage_runs_total counter",
+                *(f'archiver_stage_runs_total{{stage="{stage}"}} {runs}' for stage, runs in self.stage_runs.items()),
+                "# HELP archiver_stage_failures_total Times each stage failed.",
+                "# TYPE archiver_stage_failures_total counter",
+                *(f'archiver_stage_failures_total{{stage="{stage}"}} {self.stage_failures.get(stage, 0)}' for stage in self.stage_runs),
+            ]
+            for counter, value in self.counters.items():
+                lines += [
+                    f"# HELP archiver_{counter}_total {COUNTER_HELP.get(counter, counter)}",
+                    f"# TYPE archiver_{counter}_total counter",
+                    f"archiver_{counter}_total {value}",
+                ]
+        temp_path = f"{self.prom_path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            os.replace(temp_path, self.prom_path)
+        except OSError as e:
+            logging.warning(f"Could not write metrics to {self.prom_path}: {e}")
+
+
+class VideoMetrics:
+    """Stage timings and counters of a single video, recorded in the metrics of its run."""
+
+    def __init__(self, run_metrics: RunMetrics, yt_url: str):
+        self.run_metrics = run_metrics
+        self.yt_url = yt_url
+
+    def stage(self, stage: str) -> ContextManager:
+        """Time a stage of the video."""
+        return self.run_metrics.stage(self.yt_url, stage)
+
+    def count(self, counter: str, value: int = 1) -> None:
+        """Add value to a counter of the video."""
+        self.run_metrics.count(self.yt_url, counter, value)
+
+
+def measure_stage(metrics: VideoMetrics | None, stage: str) -> ContextManager:
+    """Return a context manager timing a stage of a video, or doing nothing without metrics."""
+    return metrics.stage(stage) if metrics is not None else nullcontext()
+
+
+class YtDlpMetricsLogger:
+    """
+    yt-dlp logger counting the retries reported while downloading a video.
+    Debug and warning messages are dropped as with the quiet and no_warnings options, errors are logged.
+    """
+
+    def __init__(self, metrics: VideoMetrics):
+        self.metrics = metrics
+
+    def count_retries(self, msg: str) -> None:
+        if "Retrying" in msg:
+            self.metrics.count(RETRIES)
+
+    def debug(self, msg: str) -> None:
+        self.count_retries(msg)
+
+    def info(self, msg: str) -> None:
+        self.count_retries(msg)
+
+    def warning(self, msg: str) -> None:
+        self.count_retries(msg)
+
+    def error(self, msg: str) -> None:
+        logging.error(msg)
@@ -1,7 +1,11 @@
 import nodriver as uc
 import os
-from time import sleep
-from typing import Callable
+import json
+import base64
+import asyncio
+import logging
+from asyncio import sleep
+from typing import Awaitable, Callable
 from psutil import process_iter
 from random import uniform
 
@@ -10,10 +14,24 @@ def kill_process(process_name: str) -> None:
     if process_name in (p.name() for p in process_iter()):
         os.system(f"taskkill /f /im {process_name}")
 
-async def nodriver_setup(profile:str, browser:str, headless: bool):
+# Command line switches of every browser started by the archiver
+BROWSER_ARGS = [
+    "--mute-audio",
+    "--disable-notifications",
+    "--no-first-run",
+    "--no-service-autorun",
+    "--password-store=basic",
+    "--hide-crash-restore-bubble",
+    # Videos are scraped in several tabs at once, keep the background ones running at full speed
+    "--disable-background-timer-throttling",
+    "--disable-renderer-backgrounding",
+    "--disable-backgrounding-occluded-windows",
+]
 
+def get_browser_paths(browser: str) -> tuple[str, str, str] | None:
+    """Return the user data directory, executable path and process name of a supported browser."""
     pc_user = os.getlogin()
-    
+
     if browser == "Brave":
         program_files = "Program Files" if "BraveSoftware" in os.listdir("C:\\Program Files") else "Program Files (x86)"
         user_data_dir=rf"C:\Users\{pc_user}\AppData\Local\BraveSoftware\Brave-Browser\User Data"
@@ -31,7 +49,15 @@ async def nodriver_setup(profile:str, browser:str, headless: bool):
         process_name = "msedge.exe"
     else:
         print("Invalid browser name")
+        return None
+    return user_data_dir, browser_executable_path, process_name
+
+async def nodriver_setup(profile:str, browser:str, headless: bool):
+
+    browser_paths = get_browser_paths(browser)
+    if browser_paths is None:
         return
+    user_data_dir, browser_executable_path, process_name = browser_paths
 
     # Kill all chrome.exe processes to avoid chromedriver window already closed exception
     kill_process(process_name)
@@ -40,28 +66,75 @@ async def nodriver_setup(profile:str, browser:str, headless: bool):
         headless=headless,
         user_data_dir=user_data_dir, # by specifying it, it won't be automatically cleaned up when finished
         browser_executable_path=browser_executable_path,
-        browser_args=[
-            f'--profile-directory={profile}',
-            "--mute-audio",
-            "--disable-notifications",
-            "--no-first-run",
-            "--no-service-autorun",
-            "--password-store=basic",
-            "--hide-crash-restore-bubble",
-            ],
+        browser_args=[f'--profile-directory={profile}', *BROWSER_ARGS],
         lang="en-US"
     )
     return driver
 
+class ResponseRecorder:
+    """Record the JSON bodies of the responses whose URL contains url_filter through the CDP network domain."""
+
+    def __init__(self, url_filter: str):
+        self.url_filter = url_filter
+        self.tab = None
+        self.request_ids = set()
+        self.body_reads = []
+
+    async def start(self, tab: uc.Tab) -> None:
+        """Start recording the responses of the tab."""
+        self.tab = tab
+        tab.add_handler(uc.cdp.network.ResponseReceived, self.on_response_received)
+        tab.add_handler(uc.cdp.network.LoadingFinished, self.on_loading_finished)
+        await tab.send(uc.cdp.network.enable())
+
+    def on_response_received(self, event: uc.cdp.network.ResponseReceived) -> None:
+        if self.url_filter in event.response.url:
+            self.request_ids.add(event.request_id)
+
+    def on_loading_finished(self, event: uc.cdp.network.LoadingFinished) -> None:
+        # Read the body right away, before the browser evicts it from its buffer
+        if event.request_id in self.request_ids:
+            self.body_reads.append(asyncio.ensure_future(self.read_body(event.request_id)))
+
+    async def read_body(self, request_id: uc.cdp.network.RequestId) -> dict | None:
+        try:
+            body, base64_encoded = await self.tab.send(uc.cdp.network.get_response_body(request_id))
+            if base64_encoded:
+                body = base64.b64decode(body).decode("utf-8")
+            return json.loads(body)
+        except Exception as e:
+            logging.warning(f"Could not read response body {request_id}: {e}")
+            return None
+
+    async def stop(self) -> list[dict]:
+        """Stop recording and return the recorded response bodies in load order."""
+        self.tab.remove_handler(uc.cdp.network.ResponseReceived, self.on_response_received)
+        self.tab.remove_handler(uc.cdp.network.LoadingFinished, self.on_loading_finished)
+        responses = await asyncio.gather(*self.body_reads)
+        return [response for response in responses if response is not None]
+
 async def split_window_size(tab: uc.Tab, delay: Callable[[int], float]) -> None:
     """Split the window size."""
     await tab.set_window_size(top=1, left=1)
-    sleep(delay())
+    await sleep(delay())
 
-async def get_nodriver_tab(driver, url: str, delay: Callable[[int], float], add_tab_delay: int = 5, split_tabs: bool = False) -> uc.Tab:
-    """Get a new tab in the nodriver instance."""
-    tab = await driver.get(url)
-    sleep(delay() + add_tab_delay)
+async def get_nodriver_tab(driver, url: str, delay: Callable[[int], float], add_tab_delay: int = 5, split_tabs: bool = False, new_tab: bool = False, before_navigate: Callable[[uc.Tab], Awaitable[None]] | None = None) -> uc.Tab:
+    """
+    Get a tab in the nodriver instance, opening a new one if new_tab is set.
+    before_navigate is awaited with the blank tab before the url is loaded.
+    New tabs are emulated as focused, so lazy-loaded content keeps loading while they are in the background,
+    also in browsers started without the anti-throttling switches of BROWSER_ARGS (e.g. an attached one).
+    """
+    if not new_tab and before_navigate is None:
+        tab = await driver.get(url)
+    else:
+        tab = await driver.get("about:blank", new_tab=new_tab)
+        if new_tab:
+            await tab.send(uc.cdp.emulation.set_focus_emulation_enabled(True))
+        if before_navigate is not None:
+            await before_navigate(tab)
+        await tab.get(url)
+    await sleep(delay() + add_tab_delay)
     if split_tabs:
         await split_window_size(tab, delay)
     return tab
@@ -71,12 +144,12 @@ async def slow_scroll(tab, delay: Callable[[int], float]) -> None:
     for _ in range(3):
         scroll_amount = uniform(100, 120)
         await tab.evaluate(f"window.scrollBy(0, {scroll_amount});")
-        sleep(delay())
+        await sleep(delay())
 
 async def page_scroll(tab, delay: Callable[[int], float], add_delay: int = 0, end_key: bool = False) -> str | None:
     """Scroll the webpage. Return 'page_end' if reached the bottom."""
     last_height = await tab.evaluate("document.body.scrollHeight")
-    sleep(delay() + 5 + add_delay)
+    await sleep(delay() + 5 + add_delay)
 
     if end_key:
         await send_key(tab, "End", 35)
@@ -93,6 +166,107 @@ async def page_scroll(tab, delay: Callable[[int], float], add_delay: int = 0, en
 
     last_height = new_height
 
+async def wait_for_new_elements(tab, selector: str, previous_count: int, timeout: float) -> int:
+    """
+    Wait until more than previous_count elements match selector or the timeout passes.
+    The page is watched with a MutationObserver, so this returns as soon as new nodes arrive.
+    Return the number of matching elements.
+    """
+    return await tab.evaluate(f"""
+        new Promise(resolve => {{
+            const selector = {json.dumps(selector)};
+            const count = () => document.querySelectorAll(selector).length;
+            if (count() > {previous_count}) {{
+                resolve(count());
+                return;
+            }}
+            const observer = new MutationObserver(mutations => {{
+                const added = mutations.some(mutation => Array.from(mutation.addedNodes).some(
+                    node => node.nodeType === Node.ELEMENT_NODE && (node.matches(selector) || node.querySelector(selector))
+                ));
+                if (added && count() > {previous_count}) {{
+                    clearTimeout(timer);
+                    observer.disconnect();
+                    resolve(count());
+                }}
+            }});
+            const timer = setTimeout(() => {{
+                observer.disconnect();
+                resolve(count());
+            }}, {int(timeout * 1000)});
+            observer.observe(document.body, {{childList: true, subtree: true}});
+        }})
+    """, await_promise=True)
+
+async def scroll_to_bottom(tab) -> None:
+    """Scroll the page to the bottom at once."""
+    await tab.evaluate("""
+        var scrollingElement = document.scrollingElement || document.body;
+        scrollingElement.scrollTop = scrollingElement.scrollHeight;
+    """)
+
+async def scroll_until_no_new_elements(tab, selector: str, max_elements: int, timeout: float, max_idle_scrolls: int = 2) -> int:
+    """
+    Scroll to the bottom again as soon as new elements matching selector arrive.
+    Stop once more than max_elements are loaded or more than max_idle_scrolls scrolls in a row load nothing.
+    Return the number of loaded elements.
+    """
+    count = await tab.evaluate(f"document.querySelectorAll({json.dumps(selector)}).length")
+    idle_scrolls = 0
+    while count <= max_elements:
+        await scroll_to_bottom(tab)
+        new_count = await wait_for_new_elements(tab, selector, count, timeout)
+        if new_count > count:
+            idle_scrolls = 0
+        else:
+            idle_scrolls += 1
+            if idle_scrolls > max_idle_scrolls:
+                break
+        count = new_count
+    return count
+
+async def click_all_elements(tab, selector: str, marker: str = "data-archiver-clicked") -> int:
+    """
+    Click every rendered element matching selector in a single evaluate call.
+    Clicked elements are marked with the marker attribute, so later calls only click new ones.
+    Return the number of clicked elements.
+    """
+    return await tab.evaluate(f"""
+        (() => {{
+            const marker = {json.dumps(marker)};
+            let clicked = 0;
+            for (const element of document.querySelectorAll({json.dumps(selector)})) {{
+                if (element.hasAttribute(marker) || element.offsetParent === null) continue;
+                element.setAttribute(marker, "");
+                element.click();
+                clicked++;
+            }}
+            return clicked;
+        }})()
+    """)
+
+async def harvest_elements(tab, selector: str, limit: int, marker: str = "data-archiver-harvested") -> list[str]:
+    """
+    Return the outer HTML of up to limit elements matching selector that were not harvested yet.
+    Harvested elements are marked with the marker attribute and emptied, so the page keeps them in
+    its layout without holding their content.
+    """
+    harvested = await tab.evaluate(f"""
+        (() => {{
+            const marker = {json.dumps(marker)};
+            const harvested = [];
+            for (const element of document.querySelectorAll({json.dumps(selector)})) {{
+                if (harvested.length >= {int(limit)}) break;
+                if (element.hasAttribute(marker)) continue;
+                harvested.push(element.outerHTML);
+                element.setAttribute(marker, "");
+                element.innerHTML = "";
+            }}
+            return JSON.stringify(harvested);
+        }})()
+    """)
+    return json.loads(harvested)
+
 async def page_scroll_to_bottom(tab, delay: Callable[[int], float], max_page_end_count: int = 5, page_scroll_limit: int = None, end_key: bool = False):
     """Scroll to the bottom of the page."""
     page_end_count = 0
@@ -116,7 +290,7 @@ async def scroll_until_elements_loaded(tab, number_of_elements: int, number_of_p
     scroll_count += extra_scrolls
     for _ in range(scroll_count):
         await send_key(tab, "End", 35)
-        sleep(delay() + 1)
+        await sleep(delay() + 1)
 
 async def send_key(tab, key: str, windows_virtual_key_code: int, modifiers=None):
     """Send a key to the tab."""
@@ -162,16 +336,16 @@ async def nodriver_send_message(tab, message_input_ele, message: str, delay: Cal
         if idx < len(messages) - 1:
             await send_key(tab, "Enter", 13, modifiers=8)
 
-        sleep(delay())
+        await sleep(delay())
 
     if press_enter:
         await send_key(tab, "Enter", 13)
-        sleep(delay() + 3)
+        await sleep(delay() + 3)
 
 async def activate_dialog_window(element, delay: Callable[[int], float]) -> None:
     """Activate the dialog window to then scroll it down."""
     await element.mouse_click(button="middle")
-    sleep(delay() + 2)
+    await sleep(delay() + 2)
 
 def random_delay(min_delay: int = 1) -> Callable[[int], float]:
     """Return a delay function with randomization."""
@@ -0,0 +1,36 @@
+# Shared process pool running the CPU-heavy post-processing (comment parsing, audio extraction) off the event loop
+import os
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+
+_process_pool: ProcessPoolExecutor | None = None
+_process_pool_size = 0
+
+
+def start_process_pool(max_workers: int | None = None) -> ProcessPoolExecutor:
+    """Start the post-processing pool if it is not running, with one worker per CPU core by default."""
+    global _process_pool, _process_pool_size
+    if _process_pool is None:
+        _process_pool_size = max_workers or os.cpu_count() or 1
+        _process_pool = ProcessPoolExecutor(max_workers=_process_pool_size)
+    return _process_pool
+
+
+def process_pool_size() -> int:
+    """Return the number of workers of the post-processing pool, starting it if it is not running."""
+    start_process_pool()
+    return _process_pool_size
+
+
+def shutdown_process_pool() -> None:
+    """Wait for the queued post-processing jobs and stop the pool."""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown()
+        _process_pool = None
+
+
+def run_in_process_pool(func: Callable, *args) -> asyncio.Future:
+    """Queue func(*args) on the post-processing pool and return a future of its result."""
+    return asyncio.get_running_loop().run_in_executor(start_process_pool(), func, *args)
@@ -1,21 +1,53 @@
+import html
 import logging
 import traceback
 import urllib.parse
 import json
 import os
 from datetime import datetime, timezone
-from time import sleep
-from typing import Callable
+from asyncio import sleep
+from collections import deque
+from typing import AsyncIterator, Callable
 from selectolax.parser import HTMLParser
-from bs4 import BeautifulSoup
-from archiver_packages.utilities.nodriver_utils import slow_scroll, page_scroll, scroll_until_elements_loaded, activate_dialog_window
+from archiver_packages.utilities.nodriver_utils import (
+    slow_scroll,
+    page_scroll,
+    scroll_until_elements_loaded,
+    scroll_until_no_new_elements,
+    scroll_to_bottom,
+    wait_for_new_elements,
+    click_all_elements,
+    harvest_elements,
+    activate_dialog_window,
+    ResponseRecorder,
+)
+from archiver_packages.utilities.process_pool import run_in_process_pool, process_pool_size
+from archiver_packages.utilities.metrics import (
+    VideoMetrics,
+    measure_stage,
+    LOAD_ALL_COMMENTS,
+    EXPAND_ALL_COMMENTS,
+    HARVEST_COMMENTS,
+    PARSE_RENDER,
+    COMMENTS,
+    REPLIES,
+)
 from archiver_packages.youtube.extract_comment_emoji import convert_youtube_emoji_url_to_emoji
+from archiver_packages.youtube.comment_writer import CommentWriter
+from archiver_packages.youtube.comment_sources import parse_comment_responses, parse_info_comments, style_reply_mention
 import archiver_packages.youtube_html_elements as youtube_html_elements
 import nodriver as uc
 
 
 logging.basicConfig(level=logging.INFO)
 
+COMMENT_THREAD_SELECTOR = "#contents ytd-comment-thread-renderer"
+# Comment threads harvested per evaluate call in harvest mode
+HARVEST_CHUNK_SIZE = 50
+# Buttons loading the replies of a comment thread, and the replies they load
+REPLY_EXPANDER_SELECTOR = "#more-replies-sub-thread button, button[aria-label='Show more replies']"
+REPLY_SELECTOR = "#expander-contents #body"
+
 
 def format_text_emoji(input_text: str) -> str:
     """
@@ -37,9 +69,10 @@ def format_text_emoji(input_text: str) -> str:
     return '\n'.join(merged_lines)
 
 
-async def parse_comment_text(comment_ele:HTMLParser) -> tuple[str, str]:
+def parse_comment_text(comment_ele:HTMLParser) -> tuple[str, str]:
     """
     Parse comments/replies text and return both plain and styled text.
+    The text element is walked once, emitting the plain and styled piece of each node together.
 
     Args:
         comment_ele: The comment element to parse.
@@ -48,61 +81,45 @@ async def parse_comment_text(comment_ele:HTMLParser) -> tuple[str, str]:
         tuple[str, str]: Plain text and styled text.
     """
     text_ele = comment_ele.css_first('#content-text')
-    text_ele_html = text_ele.html
-    soup = BeautifulSoup(text_ele_html, 'html.parser')
-    # Replace <img> tags with emoji
-    for img_ele in soup.find_all(lambda tag: tag.name == "img" and tag.has_attr('src') and "emoji" in tag["src"]):
-        emoji_url = img_ele["src"]
-        emoji = convert_youtube_emoji_url_to_emoji(emoji_url)
-        img_ele.replace_with(emoji)
-    url_list, timestamp_list = [], []
-    # Replace url tags with url
-    for url_ele in soup.find_all(lambda tag: tag.name == "a" and tag.has_attr('href') and "https://" in tag.text):
-        url = url_ele.text.strip()
-        url_ele.replace_with(url)
-        url_list.append(url)
-    # Replace timestamp <a> tags with styled timestamp  
-    for url_ele in soup.find_all(lambda tag: tag.name == "a" and tag.has_attr('href') and "&t=" in tag["href"]):
-        timestamp_url = url_ele["href"]
-        timestamp_url = "https://www.youtube.com/" + timestamp_url
-        timestamp_text = url_ele.text.strip()
-        url_ele.replace_with(timestamp_text)
-        timestamp_list.append({"text": timestamp_text, "url": timestamp_url})
-    # Extract text
-    text = soup.get_text(separator=' ')
-    styled_text = text
-    # Replace url tags with styled urls
-    for url in url_list:
-        styled_url = youtube_html_elements.text_url_style(url)
-        styled_text = styled_text.replace(url, styled_url)
-    # Replace timestamp tags with styled timestamps
-    for timestamp in timestamp_list:
-        timestamp_text = timestamp.get("text")
-        timestamp_url = timestamp.get("url")
-        styled_timestamp = youtube_html_elements.redirect_url(timestamp_text, timestamp_url)
-        styled_text = styled_text.replace(timestamp_text, styled_timestamp)
-    return text, styled_text
-
-
-def style_reply_mention(input_text: str) -> str:
-    """
-    Style reply mentions in the input text.
-
-    Args:
-        input_text (str): The input text to style.
+    plain_parts, styled_parts = [], []
+
+    def walk(node) -> None:
+        child = node.child
+        while child is not None:
+            if child.tag == '-text':
+                text = child.text(deep=False)
+                plain_parts.append(text)
+                styled_parts.append(html.escape(text, quote=False))
+            elif child.tag == 'img':
+                # Replace emoji images with emoji
+                emoji_url = child.attributes.get('src') or ""
+                if "emoji" in emoji_url:
+                    emoji = convert_youtube_emoji_url_to_emoji(emoji_url)
+                    plain_parts.append(emoji)
+                    styled_parts.append(emoji)
+            elif child.tag == 'a' and 'href' in child.attributes:
+                link_text = child.text()
+                href = child.attributes.get('href') or ""
+                if "https://" in link_text:
+                    # Replace url tags with styled urls
+                    url = link_text.strip()
+                    plain_parts.append(url)
+                    styled_parts.append(youtube_html_elements.text_url_style(html.escape(url)))
+                elif "&t=" in href:
+                    # Replace timestamp tags with styled timestamps
+                    timestamp_text = link_text.strip()
+                    plain_parts.append(timestamp_text)
+                    styled_parts.append(youtube_html_elements.redirect_url(
+                        html.escape(timestamp_text, quote=False), html.escape("https://www.youtube.com/" + href)
+                    ))
+                else:
+                    walk(child)
+            else:
+                walk(child)
+            child = child.next
 
-    Returns:
-        str: The styled text with mentions.
-    """
-    input_text = input_text.strip()
-    if input_text.startswith('@'):
-        words = input_text.split(' ', 1)
-        if len(words) > 1:
-            mention, remaining_text = words
-            mention = mention.strip()
-            input_text = youtube_html_elements.mention(mention)
-            input_text = f"{input_text} {remaining_text}"
-    return input_text
+    walk(text_ele)
+    return ' '.join(plain_parts), ' '.join(styled_parts)
 
 
 def parse_comments(html: HTMLParser) -> tuple[str, str, str, str, str]:
@@ -159,33 +176,54 @@ def parse_comments(html: HTMLParser) -> tuple[str, str, str, str, str]:
     return like_count, channel_username, comment_date, channel_url, channel_pfp
 
 
-async def load_all_comments(tab, delay: Callable[[int], float], max_comments: int, comment_count: int) -> list:
+async def prepare_comment_section(tab, delay: Callable[[int], float], comment_count: int) -> None:
     """
-    Scroll to end of the page to load all comments.
+    Prepare the page for loading comments.
 
     Args:
         tab: The browser tab object.
         delay (Callable): Delay function.
-        max_comments (int): Maximum number of comments to load.
         comment_count (int): Total number of comments expected.
-
-    Returns:
-        list: List of loaded comment elements.
     """
-
     if comment_count < 200:
         try:
             await tab.evaluate("document.querySelector('#related')?.remove();")
         except Exception as e:
             logging.warning(f"Could not remove #related element: {e}")
 
-    sleep(delay() + 1)
+    await sleep(delay() + 1)
     try:
         activate_btn = await tab.select("#owner-sub-count")
         await activate_dialog_window(activate_btn, delay)
     except:
         pass
-    sleep(delay() + 1)
+    await sleep(delay() + 1)
+
+
+async def load_all_comments(tab, delay: Callable[[int], float], max_comments: int, comment_count: int, event_driven: bool = False) -> int:
+    """
+    Scroll to end of the page to load all comments.
+
+    Args:
+        tab: The browser tab object.
+        delay (Callable): Delay function.
+        max_comments (int): Maximum number of comments to load.
+        comment_count (int): Total number of comments expected.
+        event_driven (bool): Scroll again as soon as new comment threads are rendered
+            instead of waiting a fixed delay, timing out only when nothing arrives.
+
+    Returns:
+        int: Number of loaded comment elements.
+    """
+
+    await prepare_comment_section(tab, delay, comment_count)
+    if event_driven:
+        return await scroll_until_no_new_elements(
+            tab=tab,
+            selector=COMMENT_THREAD_SELECTOR,
+            max_elements=max_comments,
+            timeout=delay() + 5,
+        )
     extra_scrolls = 5 if comment_count < 200 else 0
     await scroll_until_elements_loaded(
         tab=tab,
@@ -203,14 +241,14 @@ async def load_all_comments(tab, delay: Callable[[int], float], max_comments: in
             await slow_scroll(tab, delay)
         else:
             page_end_count = 0
-        comments = await tab.select_all('#contents ytd-comment-thread-renderer')
+        comments = await tab.select_all(COMMENT_THREAD_SELECTOR)
         comments_count = len(comments)
         if comments_count > max_comments:
             break
-    return comments
+    return comments_count
 
 
-async def check_for_pinned_comment(comment: HTMLParser, comments_fetched: int) -> bool:
+def check_for_pinned_comment(comment: HTMLParser, comments_fetched: int) -> bool:
     """
     Check if the comment is pinned.
 
@@ -229,23 +267,6 @@ async def check_for_pinned_comment(comment: HTMLParser, comments_fetched: int) -
     return is_comment_pinned
 
 
-def save_comments_to_json_file(path: str, comments_list: list[dict]) -> None:
-    """
-    Save comments to a JSON file.
-
-    Args:
-        path (str): Path to save the JSON file.
-        comments_list (list[dict]): List of comment dictionaries.
-    """
-    if comments_list:
-        try:
-            data = json.dumps(comments_list, indent=4)
-            with open(path, "w", encoding="utf-8") as outfile:
-                outfile.write(data)
-        except (OSError, TypeError) as e:
-            logging.error(f"Error saving comments to {path}: {e}\n{traceback.format_exc()}")
-
-
 async def expand_all_comments(tab: uc.Tab, delay: Callable[[int], float]):
     """
     Expand all comments and replies on the page.
@@ -258,11 +279,11 @@ async def expand_all_comments(tab: uc.Tab, delay: Callable[[int], float]):
     expand_buttons = await tab.select_all('#more-replies-sub-thread button')
     for button in expand_buttons:
         await button.scroll_into_view()
-        sleep(delay() + 1)
+        await sleep(delay() + 1)
         await button.click()
-        sleep(delay() + 2)
+        await sleep(delay() + 2)
         await slow_scroll(tab, delay)
-        sleep(delay() + 2)
+        await sleep(delay() + 2)
 
     show_more_replies_expanded_count = 0
 
@@ -275,47 +296,249 @@ async def expand_all_comments(tab: uc.Tab, delay: Callable[[int], float]):
 
         for button in show_more_replies:
             await button.scroll_into_view()
-            sleep(delay() + 1)
+            await sleep(delay() + 1)
             await button.click()
             show_more_replies_expanded_count += 1
-            sleep(delay() + 2)
+            await sleep(delay() + 2)
             await slow_scroll(tab, delay)
-            sleep(delay() + 3)
+            await sleep(delay() + 3)
 
 
-async def add_comments(
-    tab,
-    output_directory: str,
-    profile_image: str,
-    comment_count: int,
-    channel_author: str,
-    output,
-    delay: Callable[[int], float],
-    max_comments: int,
-) -> None:
+async def expand_all_comments_batched(tab: uc.Tab, timeout: float) -> int:
     """
-    Fetch and process YouTube comments, saving them to HTML and JSON.
+    Expand all replies by clicking every visible reply expander at once, then waiting for the
+    replies they load together. Repeat until a round clicks nothing and no more replies arrive.
 
     Args:
         tab: The browser tab object.
-        output_directory (str): Directory to save the output files.
+        timeout (float): Seconds to wait for new replies after each round.
+
+    Returns:
+        int: Number of clicked expanders.
+    """
+    logging.info("Expanding all comments...")
+    reply_count = await tab.evaluate(f"document.querySelectorAll({json.dumps(REPLY_SELECTOR)}).length")
+    expanded = 0
+    while True:
+        clicked = await click_all_elements(tab, REPLY_EXPANDER_SELECTOR)
+        if clicked == 0 and expanded == 0:
+            # Nothing to expand, so no replies are loading either
+            break
+        expanded += clicked
+        new_reply_count = await wait_for_new_elements(tab, REPLY_SELECTOR, reply_count, timeout)
+        logging.debug(f"Clicked {clicked} reply expanders, {new_reply_count} replies loaded.")
+        if clicked == 0 and new_reply_count == reply_count:
+            break
+        reply_count = new_reply_count
+    return expanded
+
+
+def escape_comment_fields(comment_dict: dict) -> tuple[str, str, str, str, str]:
+    """
+    Escape the plain text fields of a comment dict for the comment and reply boxes.
+    The fields come unescaped from the page, the comment API or yt-dlp.
+
+    Args:
+        comment_dict (dict): The comment or reply dict.
+
+    Returns:
+        tuple[str, str, str, str, str]: channel_url and channel_pfp escaped as attribute values,
+            channel_username, comment_date and like_count escaped as text.
+    """
+    return (
+        html.escape(comment_dict["channel_url"]),
+        html.escape(comment_dict["channel_pfp"]),
+        html.escape(comment_dict["channel_username"], quote=False),
+        html.escape(comment_dict["comment_date"], quote=False),
+        html.escape(comment_dict["like_count"], quote=False),
+    )
+
+
+def comment_thread_html(thread: tuple, profile_image: str, channel_author: str) -> str:
+    """
+    Render a comment thread and its replies as HTML.
+
+    Args:
+        thread (tuple): comment_dict, styled_text, styled_replies, is_comment_pinned, reply_count.
+            styled_replies holds the styled text of each entry in comment_dict["replies"] and
+            reply_count is the replies toggle label, or None if the comment has no replies.
         profile_image (str): URL of the profile image.
-        comment_count (int): Total number of comments expected.
         channel_author (str): Author of the channel.
-        output: Output file object.
-        delay (Callable): Delay function.
-        max_comments (int): Maximum number of comments to fetch.
+
+    Returns:
+        str: The comment thread HTML.
+    """
+    comment_dict, styled_text, styled_replies, is_comment_pinned, reply_count = thread
+    profile_image = html.escape(profile_image)
+    channel_author = html.escape(channel_author, quote=False)
+    heart = youtube_html_elements.heart(profile_image) if comment_dict["author_heart"] else ""
+    channel_url, channel_pfp, channel_username, comment_date, like_count = escape_comment_fields(comment_dict)
+    thread_html = youtube_html_elements.comment_box(
+        channel_url, channel_pfp, channel_username, channel_author,
+        comment_date, styled_text, like_count, heart, is_comment_pinned
+    )
+    divs = youtube_html_elements.ending.divs
+    if reply_count is None:
+        return thread_html + divs
+    thread_html += youtube_html_elements.replies_toggle(html.escape(str(reply_count), quote=False)) + divs
+    for reply_dict, styled_reply in zip(comment_dict["replies"], styled_replies):
+        heart = youtube_html_elements.heart(profile_image) if reply_dict["author_heart"] else ""
+        channel_url, channel_pfp, channel_username, comment_date, like_count = escape_comment_fields(reply_dict)
+        thread_html += youtube_html_elements.reply_box(
+            channel_url, channel_pfp, channel_username, comment_date, styled_reply, like_count, heart
+        )
+    return thread_html
+
+
+def failed_comment_entry(ele, comment_number: int, comments_count: int, error: Exception, reply_index: int | None = None) -> dict:
+    """
+    Build the debug log entry of a comment or reply that failed to parse.
+
+    Args:
+        ele: The comment or reply element.
+        comment_number (int): Number of the comment in the page.
+        comments_count (int): Number of comments parsed from the page.
+        error (Exception): The parsing error.
+        reply_index (int | None): Number of the reply in its thread, None for a comment.
+
+    Returns:
+        dict: The failed comment debug entry.
+    """
+    # Try to extract raw text for the debug log
+    raw_text = ""
+    try:
+        text_ele = ele.css_first('#content-text')
+        if text_ele:
+            raw_text = text_ele.text().strip()
+    except Exception:
+        raw_text = "<could not extract text>"
+    entry = {
+        "comment_number": comment_number,
+        "total_comments": comments_count,
+        "type": "comment" if reply_index is None else "reply",
+    }
+    if reply_index is not None:
+        entry["reply_index"] = reply_index
+    entry.update({
+        "comment_text": raw_text,
+        "error": f"{type(error).__name__}: {error}",
+        "traceback": traceback.format_exc(),
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    })
+    return entry
+
+
+def parse_comment_thread(comment_html: str, comment_number: int, comments_count: int) -> tuple[tuple | None, list[dict]]:
+    """
+    Parse a comment thread and its replies. Runs in the post-processing pool, so it only takes
+    and returns picklable values.
+
+    Args:
+        comment_html (str): HTML of the ytd-comment-thread-renderer element.
+        comment_number (int): Number of the comment in the page.
+        comments_count (int): Number of comments parsed from the page.
+
+    Returns:
+        tuple[tuple | None, list[dict]]: The comment thread (see comment_thread_html), or None if the
+            comment failed to parse, and the failed comment debug entries.
+    """
+    comment = HTMLParser(comment_html).css_first('ytd-comment-thread-renderer')
+    failed_comments = []
+    try:
+        is_comment_pinned = check_for_pinned_comment(comment, comment_number)
+        text, styled_text = parse_comment_text(comment)
+        print(f"[DEBUG] Comment text: {text[:50]}...")
+        like_count, channel_username, comment_date, channel_url, channel_pfp = parse_comments(comment)
+        print(f"[DEBUG] like_count: {like_count}, channel_username: {channel_username}")
+    except Exception as e:
+        logging.warning(f"Skipping comment {comment_number}/{comments_count}: {type(e).__name__}: {e}")
+        print(f"[WARNING] Skipping comment {comment_number}/{comments_count}: {type(e).__name__}: {e}")
+        failed_comments.append(failed_comment_entry(comment, comment_number, comments_count, e))
+        return None, failed_comments
+    comment_dict = {
+        "text": text,
+        "like_count": like_count,
+        "channel_username": channel_username,
+        "comment_date": comment_date,
+        "channel_url": channel_url,
+        "channel_pfp": channel_pfp,
+        "author_heart": bool(comment.css_first('#creator-heart-button')),
+        "replies": []
+    }
+    styled_replies = []
+    reply_count = None
+    replies_btn = comment.css("#more-replies button")
+    if len(replies_btn) != 0:
+        reply_count = comment.css_first("[id='more-replies'] button")
+        try:
+            reply_count = reply_count.attributes.get("aria-label")
+        except Exception as ex:
+            logging.warning(f"Could not get aria-label for reply count: {ex}")
+            reply_count = reply_count.text()
+        replies = comment.css('div[id="expander"] div[id="expander-contents"] #body')
+        print(f"[DEBUG] Found {len(replies)} replies for comment {comment_number}")
+        for reply_index, reply in enumerate(replies, start=1):
+            try:
+                reply_text, styled_reply = parse_comment_text(reply)
+                styled_reply = style_reply_mention(styled_reply)
+                like_count, channel_username, comment_date, channel_url, channel_pfp = parse_comments(reply)
+            except Exception as e:
+                logging.warning(f"Skipping reply {reply_index} of comment {comment_number}: {type(e).__name__}: {e}")
+                print(f"[WARNING] Skipping reply {reply_index} of comment {comment_number}: {type(e).__name__}: {e}")
+                failed_comments.append(failed_comment_entry(reply, comment_number, comments_count, e, reply_index))
+                continue
+            reply_dict = {
+                "text": reply_text,
+                "like_count": like_count,
+                "channel_username": channel_username,
+                "comment_date": comment_date,
+                "channel_url": channel_url,
+                "channel_pfp": channel_pfp,
+                "author_heart": bool(reply.css_first('#creator-heart-button'))
+            }
+            comment_dict["replies"].append(reply_dict)
+            styled_replies.append(styled_reply)
+    return (comment_dict, styled_text, styled_replies, is_comment_pinned, reply_count), failed_comments
+
+
+def parse_window() -> int:
+    """Return the number of comment threads queued on the post-processing pool at most, two per worker."""
+    return 2 * process_pool_size()
+
+
+async def drain_parsed_threads(pending: deque, failed_comments: list[dict], keep: int = 0) -> AsyncIterator[tuple]:
     """
-    await slow_scroll(tab, delay)
-    logging.info("Loading comments...")
-    print("[DEBUG] Calling load_all_comments...")
-    loaded_comments = await load_all_comments(tab, delay, max_comments, comment_count)
-    print(f"[DEBUG] load_all_comments returned {len(loaded_comments) if loaded_comments else 0} elements")
+    Await the oldest queued thread parses until at most keep are left, yielding the parsed threads in page order.
+    Each parsed thread is released once yielded, so only the queued threads are held in memory.
 
-    # Expand all comments and replies
-    print("[DEBUG] Expanding all comments...")
-    await expand_all_comments(tab, delay)
+    Args:
+        pending (deque): Futures of the queued parse_comment_thread calls, oldest first.
+        failed_comments (list[dict]): List the debug entries of failed comments are appended to.
+        keep (int): Number of queued parses left running.
 
+    Yields:
+        tuple: Comment threads (see comment_thread_html).
+    """
+    while len(pending) > keep:
+        thread, thread_failures = await pending.popleft()
+        failed_comments.extend(thread_failures)
+        if thread is not None:
+            yield thread
+
+
+async def parse_page_comments(tab, max_comments: int, failed_comments: list[dict]) -> AsyncIterator[tuple]:
+    """
+    Parse the rendered comment threads of the page, yielding each thread in page order as soon as it is parsed.
+    The threads are parsed in the post-processing pool, with at most parse_window() of them queued at once.
+
+    Args:
+        tab: The browser tab object.
+        max_comments (int): Maximum number of comments to parse.
+        failed_comments (list[dict]): List the debug entries of failed comments are appended to.
+
+    Yields:
+        tuple: Comment threads (see comment_thread_html), nothing if the page has no comments.
+    """
     # Get html from tab
     print("[DEBUG] Getting HTML from tab...")
     tab_html = await tab.get_content()
@@ -333,7 +556,7 @@ async def add_comments(
         logging.error(f"HTMLParser failed: {e}\n{traceback.format_exc()}")
         return
     # Get all comments
-    comments = tab_html.css('#contents ytd-comment-thread-renderer')
+    comments = tab_html.css(COMMENT_THREAD_SELECTOR)
     print(f"[DEBUG] Found {len(comments)} comment elements in HTML.")
     if not comments:
         print("[ERROR] No comments found in HTML!")
@@ -344,130 +567,178 @@ async def add_comments(
     logging.info("Fetching comments...")
     print(f"[DEBUG] Processing up to {len(comments)} comments...")
     comments_count = len(comments)
-    comments_fetched = 0
-    comments_list = []
-    failed_comments = []
-    for comment in comments:
-        comments_fetched += 1
-        logging.info(f"Fetched {comments_fetched}/{comments_count} comments.")
-        print(f"[DEBUG] Processing comment {comments_fetched}/{comments_count}")
-        try:
-            is_comment_pinned = await check_for_pinned_comment(comment, comments_fetched)
-            sleep(delay() + 1)
-            text, styled_text = await parse_comment_text(comment)
-            print(f"[DEBUG] Comment text: {text[:50]}...")
-            like_count, channel_username, comment_date, channel_url, channel_pfp = parse_comments(comment)
-            print(f"[DEBUG] like_count: {like_count}, channel_username: {channel_username}")
-        except Exception as e:
-            error_msg = f"{type(e).__name__}: {e}"
-            logging.warning(f"Skipping comment {comments_fetched}/{comments_count}: {error_msg}")
-            print(f"[WARNING] Skipping comment {comments_fetched}/{comments_count}: {error_msg}")
-            # Try to extract raw text for the debug log
-            raw_text = ""
-            try:
-                text_ele = comment.css_first('#content-text')
-                if text_ele:
-                    raw_text = text_ele.text().strip()
-            except Exception:
-                raw_text = "<could not extract text>"
-            failed_comments.append({
-                "comment_number": comments_fetched,
-                "total_comments": comments_count,
-                "type": "comment",
-                "comment_text": raw_text,
-                "error": error_msg,
-                "traceback": traceback.format_exc(),
-                "timestamp": datetime.now(timezone.utc).isoformat()
-            })
-            continue
-        heart = comment.css_first('#creator-heart-button')
-        if heart:
-            heart = youtube_html_elements.heart(profile_image)
+    window = parse_window()
+    pending = deque()
+    # The page HTML is already captured, so the threads are collected without throttling
+    for comment_number, comment in enumerate(comments, start=1):
+        logging.info(f"Fetched {comment_number}/{comments_count} comments.")
+        print(f"[DEBUG] Processing comment {comment_number}/{comments_count}")
+        pending.append(run_in_process_pool(parse_comment_thread, comment.html, comment_number, comments_count))
+        async for thread in drain_parsed_threads(pending, failed_comments, keep=window - 1):
+            yield thread
+    async for thread in drain_parsed_threads(pending, failed_comments):
+        yield thread
+
+
+async def harvest_page_comments(
+    tab,
+    delay: Callable[[int], float],
+    max_comments: int,
+    comment_count: int,
+    failed_comments: list[dict],
+    batched_expansion: bool = False,
+    chunk_size: int = HARVEST_CHUNK_SIZE,
+) -> AsyncIterator[tuple]:
+    """
+    Load, expand and parse the comment threads while scrolling, yielding each thread in page order.
+    The loaded threads are expanded, then taken out of the page in chunks and emptied there, so neither
+    the page nor the parser ever holds more than the threads loaded by one scroll.
+    The harvested threads are parsed in the post-processing pool while the next ones load, with at most
+    parse_window() of them queued at once.
+
+    Args:
+        tab: The browser tab object.
+        delay (Callable): Delay function.
+        max_comments (int): Maximum number of comments to harvest.
+        comment_count (int): Total number of comments expected.
+        failed_comments (list[dict]): List the debug entries of failed comments are appended to.
+        batched_expansion (bool): Click all reply expanders at once in each round instead of one by one.
+        chunk_size (int): Number of comment threads taken out of the page per evaluate call.
+
+    Yields:
+        tuple: Comment threads (see comment_thread_html).
+    """
+    comments_count = min(max_comments, comment_count) or max_comments
+    window = parse_window()
+    pending = deque()
+    harvested = 0
+    idle_scrolls = 0
+    loaded = await tab.evaluate(f"document.querySelectorAll({json.dumps(COMMENT_THREAD_SELECTOR)}).length")
+    while harvested < max_comments:
+        if batched_expansion:
+            await expand_all_comments_batched(tab, timeout=delay() + 5)
         else:
-            heart = ""
-        comment_box = youtube_html_elements.comment_box(
-            channel_url, channel_pfp, channel_username, channel_author, comment_date, styled_text, like_count, heart, is_comment_pinned
-        )
-        divs = youtube_html_elements.ending.divs
-        author_heart = bool(heart)
-        comment_dict = {
-            "text": text,
-            "like_count": like_count,
-            "channel_username": channel_username,
-            "comment_date": comment_date,
-            "channel_url": channel_url,
-            "channel_pfp": channel_pfp,
-            "author_heart": author_heart,
-            "replies": []
-        }
-        replies_btn = comment.css("#more-replies button")
-        if len(replies_btn) == 0:
-            comment_box += divs
-            output.write(comment_box)
+            await expand_all_comments(tab, delay)
+        while harvested < max_comments:
+            chunk = await harvest_elements(tab, COMMENT_THREAD_SELECTOR, min(chunk_size, max_comments - harvested))
+            if not chunk:
+                break
+            for comment_html in chunk:
+                harvested += 1
+                pending.append(run_in_process_pool(parse_comment_thread, comment_html, harvested, comments_count))
+                async for thread in drain_parsed_threads(pending, failed_comments, keep=window - 1):
+                    yield thread
+        logging.info(f"Harvested {harvested} comments.")
+        if harvested < max_comments:
+            # Load the next threads while the harvested ones are parsed
+            await scroll_to_bottom(tab)
+            new_loaded = await wait_for_new_elements(tab, COMMENT_THREAD_SELECTOR, loaded, delay() + 5)
+            idle_scrolls = 0 if new_loaded > loaded else idle_scrolls + 1
+            loaded = new_loaded
+        async for thread in drain_parsed_threads(pending, failed_comments):
+            yield thread
+        if idle_scrolls > 2:
+            break
+
+
+async def add_comments(
+    tab,
+    output_directory: str,
+    profile_image: str,
+    comment_count: int,
+    channel_author: str,
+    output,
+    delay: Callable[[int], float],
+    max_comments: int,
+    event_driven: bool = False,
+    comment_source: str = "dom",
+    recorder: ResponseRecorder | None = None,
+    video_url: str = "",
+    info_comments: list[dict] | None = None,
+    batched_expansion: bool = False,
+    harvest: bool = False,
+    metrics: VideoMetrics | None = None,
+) -> None:
+    """
+    Fetch and process YouTube comments, saving them to HTML and JSON.
+
+    Args:
+        tab: The browser tab object.
+        output_directory (str): Directory to save the output files.
+        profile_image (str): URL of the profile image.
+        comment_count (int): Total number of comments expected.
+        channel_author (str): Author of the channel.
+        output: Output file object.
+        delay (Callable): Delay function.
+        max_comments (int): Maximum number of comments to fetch.
+        event_driven (bool): Load comments by watching for new threads instead of fixed delays.
+        comment_source (str): "dom" to parse the rendered page, "network" to decode the comment
+            API responses captured by recorder while the page scrolls, "info_json" to use the
+            comments yt-dlp extracted into info_comments without touching the browser.
+        recorder (ResponseRecorder | None): Recorder attached to the tab before it was loaded.
+        video_url (str): URL of the video, used to link timestamps of network and info_json comments.
+        info_comments (list[dict] | None): The "comments" list of the yt-dlp info dict.
+        batched_expansion (bool): Click all reply expanders at once in each round instead of one by one.
+        harvest (bool): Parse the DOM comment threads in chunks while scrolling and remove them from the page.
+        metrics (VideoMetrics | None): Metrics the comment stage timings and counts of the video are recorded in.
+    """
+    failed_comments = []
+    saved_replies = 0
+    with CommentWriter(output_directory) as comment_writer:
+
+        def write_thread(thread: tuple) -> None:
+            nonlocal saved_replies
+            output.write(comment_thread_html(thread, profile_image, channel_author))
+            comment_writer.write(thread[0])
+            saved_replies += len(thread[0]["replies"])
+
+        if comment_source == "info_json" and info_comments is not None:
+            logging.info("Using comments extracted by yt-dlp...")
+            with measure_stage(metrics, PARSE_RENDER):
+                for thread in parse_info_comments(info_comments, video_url)[:max_comments]:
+                    write_thread(thread)
         else:
-            reply_count = comment.css_first("[id='more-replies'] button")
-            try:
-                reply_count = reply_count.attributes.get("aria-label")
-            except Exception as ex:
-                logging.warning(f"Could not get aria-label for reply count: {ex}")
-                reply_count = reply_count.text()
-            replies_toggle = youtube_html_elements.replies_toggle(reply_count)
-            comment_box += replies_toggle + divs
-            output.write(comment_box)
-            sleep(delay())
-            replies = comment.css('div[id="expander"] div[id="expander-contents"] #body')
-            print(f"[DEBUG] Found {len(replies)} replies for comment {comments_fetched}")
-            for reply_index, reply in enumerate(replies, start=1):
-                try:
-                    sleep(delay() + 1)
-                    text, styled_text = await parse_comment_text(reply)
-                    styled_text = style_reply_mention(styled_text)
-                    like_count, channel_username, comment_date, channel_url, channel_pfp = parse_comments(reply)
-                except Exception as e:
-                    error_msg = f"{type(e).__name__}: {e}"
-                    logging.warning(f"Skipping reply {reply_index} of comment {comments_fetched}: {error_msg}")
-                    print(f"[WARNING] Skipping reply {reply_index} of comment {comments_fetched}: {error_msg}")
-                    raw_text = ""
-                    try:
-                        text_ele = reply.css_first('#content-text')
-                        if text_ele:
-                            raw_text = text_ele.text().strip()
-                    except Exception:
-                        raw_text = "<could not extract text>"
-                    failed_comments.append({
-                        "comment_number": comments_fetched,
-                        "total_comments": comments_count,
-                        "type": "reply",
-                        "reply_index": reply_index,
-                        "comment_text": raw_text,
-                        "error": error_msg,
-                        "traceback": traceback.format_exc(),
-                        "timestamp": datetime.now(timezone.utc).isoformat()
-                    })
-                    continue
-                heart = reply.css_first('#creator-heart-button')
-                if heart:
-                    heart = youtube_html_elements.heart(profile_image)
-                else:
-                    heart = ""
-                reply_box = youtube_html_elements.reply_box(
-                    channel_url, channel_pfp, channel_username, comment_date, styled_text, like_count, heart
-                )
-                output.write(reply_box)
-                author_heart = bool(heart)
-                reply_dict = {
-                    "text": text,
-                    "like_count": like_count,
-                    "channel_username": channel_username,
-                    "comment_date": comment_date,
-                    "channel_url": channel_url,
-                    "channel_pfp": channel_pfp,
-                    "author_heart": author_heart
-                }
-                comment_dict["replies"].append(reply_dict)
-        comments_list.append(comment_dict)
-    print(f"[DEBUG] Saving {len(comments_list)} comments to JSON file...")
-    save_comments_to_json_file(f"{output_directory}/comments.json", comments_list)
+            if comment_source == "info_json":
+                logging.warning("No comments in the info dict, scraping them from the page instead.")
+            await slow_scroll(tab, delay)
+            if harvest and comment_source != "network":
+                logging.info("Harvesting comments...")
+                await prepare_comment_section(tab, delay, comment_count)
+                # Loading, expanding and parsing are interleaved, so they are timed as one stage
+                with measure_stage(metrics, HARVEST_COMMENTS):
+                    async for thread in harvest_page_comments(
+                        tab, delay, max_comments, comment_count, failed_comments, batched_expansion
+                    ):
+                        write_thread(thread)
+            else:
+                logging.info("Loading comments...")
+                print("[DEBUG] Calling load_all_comments...")
+                with measure_stage(metrics, LOAD_ALL_COMMENTS):
+                    loaded_comments = await load_all_comments(tab, delay, max_comments, comment_count, event_driven)
+                print(f"[DEBUG] load_all_comments returned {loaded_comments} elements")
+
+                # Expand all comments and replies
+                print("[DEBUG] Expanding all comments...")
+                with measure_stage(metrics, EXPAND_ALL_COMMENTS):
+                    if batched_expansion:
+                        await expand_all_comments_batched(tab, timeout=delay() + 5)
+                    else:
+                        await expand_all_comments(tab, delay)
+
+                with measure_stage(metrics, PARSE_RENDER):
+                    if comment_source == "network" and recorder is not None:
+                        responses = await recorder.stop()
+                        logging.debug(f"Captured {len(responses)} comment API responses.")
+                        for thread in parse_comment_responses(responses, video_url)[:max_comments]:
+                            write_thread(thread)
+                    else:
+                        async for thread in parse_page_comments(tab, max_comments, failed_comments):
+                            write_thread(thread)
+        print(f"[DEBUG] Saving {comment_writer.count} comments to JSON file...")
+        # Counted once per video, every metrics record is a file write
+        if metrics is not None:
+            metrics.count(COMMENTS, comment_writer.count)
+            metrics.count(REPLIES, saved_replies)
 
     # Save failed comments debug log if any failures occurred
     if failed_comments:
@@ -478,4 +749,4 @@ async def add_comments(
             with open(debug_path, "w", encoding="utf-8") as f:
                 json.dump(failed_comments, f, indent=4, ensure_ascii=False)
         except (OSError, TypeError) as e:
-            logging.error(f"Error saving failed comments debug log: {e}")
\ No newline at end of file
+            logging.error(f"Error saving failed comments debug log: {e}")
@@ -0,0 +1,244 @@
+import re
+import html
+import logging
+from datetime import datetime, timezone
+import archiver_packages.youtube_html_elements as youtube_html_elements
+
+# Comment pages are fetched by the watch page through continuation requests to this endpoint
+COMMENT_CONTINUATION_URL = "/youtubei/v1/next"
+
+# URLs and h:mm:ss / m:ss timestamps of plain comment text, URLs ending at quotes and angle brackets
+COMMENT_TEXT_LINK_PATTERN = re.compile(
+    r'(?P<url>https?://[^\s"\'<>]+)|(?<![\d:])(?P<timestamp>(?:\d{1,2}:)?\d{1,2}:\d{2})(?![\d:])'
+)
+
+
+def style_reply_mention(input_text: str) -> str:
+    """
+    Style reply mentions in the input text.
+
+    Args:
+        input_text (str): The input text to style.
+
+    Returns:
+        str: The styled text with mentions.
+    """
+    input_text = input_text.strip()
+    if input_text.startswith('@'):
+        words = input_text.split(' ', 1)
+        if len(words) > 1:
+            mention, remaining_text = words
+            mention = mention.strip()
+            input_text = youtube_html_elements.mention(mention)
+            input_text = f"{input_text} {remaining_text}"
+    return input_text
+
+
+def style_comment_text(text: str, video_url: str = "") -> str:
+    """
+    Escape plain comment text and style its URLs and timestamps.
+
+    Args:
+        text (str): Plain comment text.
+        video_url (str): URL of the video, timestamps are left unlinked if empty.
+
+    Returns:
+        str: The styled text.
+    """
+    def style_match(match: re.Match) -> str:
+        if match.group('url'):
+            return youtube_html_elements.text_url_style(html.escape(match.group('url')))
+        timestamp = match.group('timestamp')
+        parts = [int(part) for part in timestamp.split(':')]
+        # Minutes and seconds past 59 are not a time, only a leading hour field may be larger
+        if not video_url or any(part >= 60 for part in parts[-2:]):
+            return timestamp
+        seconds = 0
+        for part in parts:
+            seconds = seconds * 60 + part
+        return youtube_html_elements.redirect_url(timestamp, html.escape(f"{video_url}&t={seconds}s"))
+
+    styled_parts = []
+    position = 0
+    for match in COMMENT_TEXT_LINK_PATTERN.finditer(text):
+        styled_parts.append(html.escape(text[position:match.start()], quote=False))
+        styled_parts.append(style_match(match))
+        position = match.end()
+    styled_parts.append(html.escape(text[position:], quote=False))
+    return "".join(styled_parts)
+
+
+def get_channel_url(author: dict) -> str:
+    """Return the channel URL of a comment author entity."""
+    command = author.get("channelCommand", {}).get("innertubeCommand", {})
+    path = command.get("browseEndpoint", {}).get("canonicalBaseUrl") \
+        or command.get("commandMetadata", {}).get("webCommandMetadata", {}).get("url")
+    if path:
+        return "https://www.youtube.com" + path
+    return f"https://www.youtube.com/channel/{author.get('channelId', '')}"
+
+
+def comment_entity_to_dict(entity: dict, toolbar_states: dict) -> dict:
+    """
+    Convert a commentEntityPayload to the comments.json dict schema.
+
+    Args:
+        entity (dict): The commentEntityPayload of a comment or reply.
+        toolbar_states (dict): engagementToolbarStateEntityPayload objects by entity key.
+
+    Returns:
+        dict: The comment dict, without the "replies" key.
+    """
+    properties = entity.get("properties", {})
+    author = entity.get("author", {})
+    toolbar = entity.get("toolbar", {})
+    toolbar_state = toolbar_states.get(properties.get("toolbarStateKey"), {})
+    channel_pfp = author.get("avatarThumbnailUrl", "").replace("s88-c-k", "s48-c-k")
+    return {
+        "text": properties.get("content", {}).get("content", ""),
+        "like_count": toolbar.get("likeCountNotliked", "").strip(),
+        "channel_username": author.get("displayName", ""),
+        "comment_date": properties.get("publishedTime", ""),
+        "channel_url": get_channel_url(author),
+        "channel_pfp": channel_pfp,
+        "author_heart": toolbar_state.get("heartState") == "TOOLBAR_HEART_STATE_HEARTED",
+    }
+
+
+def reply_count_label(reply_count: int) -> str:
+    """Return the replies toggle label for a reply count."""
+    return "1 reply" if reply_count == 1 else f"{reply_count:,} replies"
+
+
+def parse_comment_responses(responses: list[dict], video_url: str = "") -> list[tuple]:
+    """
+    Decode captured comment continuation responses into comment threads.
+
+    Comment threads are listed in the continuation items of each response, while their
+    content is delivered as entity mutations in frameworkUpdates. Replies are matched to
+    their thread by their comment ID, which is prefixed with the parent comment ID.
+
+    Args:
+        responses (list[dict]): JSON bodies of the comment continuation responses, in load order.
+        video_url (str): URL of the video, used to link timestamps.
+
+    Returns:
+        list[tuple]: Comment threads as comment_dict, styled_text, styled_replies,
+            is_comment_pinned, reply_count (see add_comments.comment_thread_html).
+    """
+    entities = {}
+    toolbar_states = {}
+    thread_views = []
+    reply_keys = []
+    for response in responses:
+        mutations = response.get("frameworkUpdates", {}).get("entityBatchUpdate", {}).get("mutations", [])
+        for mutation in mutations:
+            payload = mutation.get("payload", {})
+            if "commentEntityPayload" in payload:
+                entities[mutation.get("entityKey")] = payload["commentEntityPayload"]
+            elif "engagementToolbarStateEntityPayload" in payload:
+                toolbar_states[mutation.get("entityKey")] = payload["engagementToolbarStateEntityPayload"]
+        for endpoint in response.get("onResponseReceivedEndpoints", []):
+            action = endpoint.get("reloadContinuationItemsCommand") or endpoint.get("appendContinuationItemsAction") or {}
+            for item in action.get("continuationItems", []):
+                if "commentThreadRenderer" in item:
+                    view = item["commentThreadRenderer"].get("commentViewModel", {}).get("commentViewModel")
+                    if view:
+                        thread_views.append(view)
+                elif "commentViewModel" in item:
+                    reply_keys.append(item["commentViewModel"].get("commentKey"))
+
+    replies_by_parent = {}
+    for reply_key in dict.fromkeys(reply_keys):
+        entity = entities.get(reply_key)
+        if entity is None:
+            logging.warning(f"Missing comment entity for reply {reply_key}")
+            continue
+        comment_id = entity.get("properties", {}).get("commentId", "")
+        replies_by_parent.setdefault(comment_id.split(".")[0], []).append(entity)
+
+    threads = []
+    seen_keys = set()
+    for view in thread_views:
+        comment_key = view.get("commentKey")
+        entity = entities.get(comment_key)
+        if entity is None or comment_key in seen_keys:
+            continue
+        seen_keys.add(comment_key)
+        comment_dict = comment_entity_to_dict(entity, toolbar_states)
+        styled_text = style_comment_text(comment_dict["text"], video_url)
+        comment_dict["replies"] = []
+        styled_replies = []
+        comment_id = entity.get("properties", {}).get("commentId", "")
+        for reply_entity in replies_by_parent.get(comment_id, []):
+            reply_dict = comment_entity_to_dict(reply_entity, toolbar_states)
+            comment_dict["replies"].append(reply_dict)
+            styled_replies.append(style_reply_mention(style_comment_text(reply_dict["text"], video_url)))
+        total_replies = entity.get("toolbar", {}).get("replyCount", "")
+        total_replies = int(total_replies) if str(total_replies).isdigit() else len(comment_dict["replies"])
+        reply_count = reply_count_label(total_replies) if total_replies else None
+        is_comment_pinned = bool(view.get("pinnedText"))
+        threads.append((comment_dict, styled_text, styled_replies, is_comment_pinned, reply_count))
+    return threads
+
+
+def info_comment_to_dict(comment: dict) -> dict:
+    """
+    Convert a yt-dlp comment to the comments.json dict schema.
+
+    Args:
+        comment (dict): A comment from the "comments" list of a yt-dlp info dict.
+
+    Returns:
+        dict: The comment dict, without the "replies" key.
+    """
+    like_count = comment.get("like_count") or 0
+    comment_date = comment.get("_time_text")
+    if not comment_date and comment.get("timestamp"):
+        comment_date = datetime.fromtimestamp(comment["timestamp"], timezone.utc).strftime("%d %B %Y")
+    channel_url = comment.get("author_url") or f"https://www.youtube.com/channel/{comment.get('author_id', '')}"
+    return {
+        "text": comment.get("text") or "",
+        "like_count": f"{like_count:,}" if like_count else "",
+        "channel_username": comment.get("author") or "",
+        "comment_date": comment_date or "",
+        "channel_url": channel_url,
+        "channel_pfp": (comment.get("author_thumbnail") or "").replace("s88-c-k", "s48-c-k"),
+        "author_heart": bool(comment.get("is_favorited")),
+    }
+
+
+def parse_info_comments(comments: list[dict], video_url: str = "") -> list[tuple]:
+    """
+    Build comment threads from the comments yt-dlp extracted into the info dict.
+    Replies are threaded under their comment through their "parent" ID.
+
+    Args:
+        comments (list[dict]): The "comments" list of a yt-dlp info dict.
+        video_url (str): URL of the video, used to link timestamps.
+
+    Returns:
+        list[tuple]: Comment threads as comment_dict, styled_text, styled_replies,
+            is_comment_pinned, reply_count (see add_comments.comment_thread_html).
+    """
+    replies_by_parent = {}
+    for comment in comments:
+        parent = comment.get("parent", "root")
+        if parent != "root":
+            replies_by_parent.setdefault(parent, []).append(comment)
+
+    threads = []
+    for comment in comments:
+        if comment.get("parent", "root") != "root":
+            continue
+        comment_dict = info_comment_to_dict(comment)
+        styled_text = style_comment_text(comment_dict["text"], video_url)
+        comment_dict["replies"] = []
+        styled_replies = []
+        for reply in replies_by_parent.get(comment.get("id"), []):
+            reply_dict = info_comment_to_dict(reply)
+            comment_dict["replies"].append(reply_dict)
+            styled_replies.append(style_reply_mention(style_comment_text(reply_dict["text"], video_url)))
+        reply_count = reply_count_label(len(comment_dict["replies"])) if comment_dict["replies"] else None
+        threads.append((comment_dict, styled_text, styled_replies, bool(comment.get("is_pinned")), reply_count))
+    return threads
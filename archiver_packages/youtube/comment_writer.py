@@ -0,0 +1,58 @@
+import os
+import json
+import logging
+import textwrap
+import traceback
+
+COMMENTS_NDJSON_FILENAME = "comments.ndjson"
+COMMENTS_JSON_FILENAME = "comments.json"
+
+
+class CommentWriter:
+    """
+    Streaming writer of the comments.json file of a video.
+    Every comment is appended to a newline-delimited JSON file as soon as it is parsed, so the comments
+    parsed so far survive a crash. Closing the writer streams them into comments.json, one comment at a
+    time, and removes the NDJSON file.
+    """
+
+    def __init__(self, output_directory: str):
+        self.ndjson_path = os.path.join(output_directory, COMMENTS_NDJSON_FILENAME)
+        self.json_path = os.path.join(output_directory, COMMENTS_JSON_FILENAME)
+        self.count = 0
+        self.file = open(self.ndjson_path, "w", encoding="utf-8")
+
+    def __enter__(self) -> "CommentWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            # Keep the NDJSON file with the comments parsed before the error
+            self.file.close()
+
+    def write(self, comment_dict: dict) -> None:
+        """Append a comment dict, with its replies, to the NDJSON file."""
+        self.file.write(json.dumps(comment_dict) + "\n")
+        self.file.flush()
+        self.count += 1
+
+    def close(self) -> None:
+        """Build comments.json from the NDJSON file, formatted like json.dumps(comments, indent=4)."""
+        self.file.close()
+        if self.count == 0:
+            os.remove(self.ndjson_path)
+            return
+        temp_path = f"{self.json_path}.tmp"
+        try:
+            with open(self.ndjson_path, encoding="utf-8") as src, open(temp_path, "w", encoding="utf-8") as dst:
+                dst.write("[")
+                for index, line in enumerate(src):
+                    dst.write(",\n" if index else "\n")
+                    dst.write(textwrap.indent(json.dumps(json.loads(line), indent=4), "    "))
+                dst.write("\n]")
+            os.replace(temp_path, self.json_path)
+            os.remove(self.ndjson_path)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.error(f"Error saving comments to {self.json_path}: {e}\n{traceback.format_exc()}")
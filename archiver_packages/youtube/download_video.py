@@ -1,5 +1,10 @@
+import os
+import re
 import yt_dlp
+from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor, FFmpegPostProcessorError
+from typing import Callable
 from archiver_packages.utilities.utilities import clear
+from archiver_packages.youtube.metadata_cache import MetadataCache
 from rich.console import Console
 from rich.table import Table
 
@@ -10,8 +15,24 @@ COOKIES = {
         "password": "...",
 }
 
-def fetch_videos_info(video_url: str) -> dict:
+FLAT_PLAYLIST_OPTIONS = {
+    'quiet': True,
+    'no_warnings': True,
+    'extract_flat': 'in_playlist',
+    'lazy_playlist': True,
+}
+
+def extract_video_id(video_url: str) -> str | None:
+    """Extract the video ID from a YouTube video URL, or None for other URLs."""
+    match = re.search(r'(?:[?&]v=|youtu\.be/|/shorts/|/live/|/embed/)([a-zA-Z0-9_-]{11})', video_url)
+    return match.group(1) if match else None
+
+def fetch_videos_info(video_url: str, metadata_cache: MetadataCache | None = None) -> dict:
     """Fetch metadata for a list of YouTube videos."""
+    if metadata_cache is not None:
+        info = metadata_cache.get(extract_video_id(video_url))
+        if info is not None:
+            return info
     ydl_opts = {
         # **COOKIES,
         'quiet': True,
@@ -24,9 +45,11 @@ def fetch_videos_info(video_url: str) -> dict:
     }
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
         info = ydl.extract_info(video_url)
+        if metadata_cache is not None and info.get('_type', 'video') == 'video':
+            metadata_cache.put(ydl.sanitize_info(info))
         return info
 
-def input_youtube_links(download_playlist: bool) -> list[str]:
+def input_youtube_links(download_playlist: bool, metadata_cache: MetadataCache | None = None) -> list[str]:
     """Prompt user for YouTube links and display info table."""
     console = Console()
     yt_links = []
@@ -49,7 +72,7 @@ def input_youtube_links(download_playlist: bool) -> list[str]:
             table.add_column("Author", style="dim")
             table.add_column("Title")
             table.add_column("Link", overflow="fold")
-            info = fetch_videos_info(yt_links[-1])
+            info = fetch_videos_info(yt_links[-1], metadata_cache)
             info_list.append(info)
             for yt_link, info in zip(yt_links, info_list):
                 video_title = info.get('title', None)
@@ -58,19 +81,71 @@ def input_youtube_links(download_playlist: bool) -> list[str]:
             console.print(table)
     except Exception:
         console.print("[bold red]Make sure, the YouTube links are in a correct format.[/bold red]")
+    if metadata_cache is not None:
+        metadata_cache.save()
     return yt_links
 
-def get_youtube_links_from_playlist_and_channel(playlist_link: str) -> list[str]:
-    """Extract all video links from a playlist or channel."""
-    with yt_dlp.YoutubeDL() as ydl:
-        playlist_dict = ydl.extract_info(playlist_link, download=False)
-        video_list = playlist_dict.get('entries', [])
-        youtube_links = [video['webpage_url'] for video in video_list]
-        return youtube_links
+def iter_playlist_entries(ydl: yt_dlp.YoutubeDL, playlist_link: str, stop_at: Callable[[dict], bool] | None = None):
+    """Yield the flat entries of a playlist or channel lazily, page by page, following channel tabs.
 
-def download_videos_with_info(video_urls: list, output_directory: str, skip_download: bool = False) -> list[dict]:
-    """Download YouTube videos and return their metadata."""
-    ydl_opts = {
+    Listing a playlist or channel tab stops at the first entry stop_at returns True for, which is
+    not yielded. Only that tab stops, the remaining tabs of a channel (e.g. Shorts, Live) are still listed.
+    """
+    result = ydl.extract_info(playlist_link, download=False, process=False)
+    if result.get('_type') in ('url', 'url_transparent'):
+        yield from iter_playlist_entries(ydl, result['url'], stop_at)
+        return
+    for entry in result.get('entries') or []:
+        if entry is None:
+            continue
+        if entry.get('ie_key') == 'YoutubeTab':
+            yield from iter_playlist_entries(ydl, entry['url'], stop_at)
+        elif stop_at is not None and stop_at(entry):
+            break
+        else:
+            yield entry
+
+def iter_youtube_links_from_playlist_and_channel(playlist_link: str, known_ids: set[str] | None = None, stop_at_known: bool = False, ydl=None):
+    """Yield the video links of a playlist or channel while it is still being listed.
+
+    Entries are extracted flat, without resolving their metadata. Already archived videos
+    in known_ids are left out, and with stop_at_known the listing of each channel tab stops
+    at the first of them, for newest-first listings like channels. Any object with a yt-dlp compatible extract_info
+    can be passed as ydl, e.g. a local fake extractor.
+    """
+    if ydl is None:
+        with yt_dlp.YoutubeDL(FLAT_PLAYLIST_OPTIONS) as ydl:
+            yield from iter_youtube_links_from_playlist_and_channel(playlist_link, known_ids, stop_at_known, ydl)
+        return
+
+    known_ids = known_ids or set()
+    stop_at = (lambda entry: entry.get('id') in known_ids) if stop_at_known else None
+    for entry in iter_playlist_entries(ydl, playlist_link, stop_at):
+        if entry.get('id') in known_ids:
+            continue
+        yield entry.get('url') or f"https://www.youtube.com/watch?v={entry['id']}"
+
+def expand_youtube_links(yt_links: list[str], known_ids: set[str] | None = None, ydl=None):
+    """Yield video links in input order, expanding playlists and channels lazily."""
+    for yt_link in yt_links:
+        if "&list=" in yt_link or "/@" in yt_link:
+            # Channels list newest videos first, so the first known one ends the new uploads
+            yield from iter_youtube_links_from_playlist_and_channel(
+                yt_link, known_ids, stop_at_known="/@" in yt_link, ydl=ydl
+            )
+        else:
+            yield yt_link
+
+def get_comment_download_options(max_comments: int) -> dict:
+    """Return the yt-dlp options that extract up to max_comments comment threads into the info dict."""
+    return {
+        'getcomments': True,
+        'extractor_args': {'youtube': {'max_comments': ['all', str(max_comments)]}},
+    }
+
+def get_download_options(output_directory: str, skip_download: bool = False, extra_options: dict | None = None) -> dict:
+    """Return the yt-dlp options used for downloading videos with their metadata."""
+    return {
         # **COOKIES,
         'quiet': True,
         'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best',
@@ -82,14 +157,23 @@ def download_videos_with_info(video_urls: list, output_directory: str, skip_down
         'writecomments': True,
         'skip_download': skip_download,
         'merge_output_format': 'mp4',
-        'outtmpl': f"{output_directory}/%(title)s [%(id)s].%(ext)s"
+        'outtmpl': f"{output_directory}/%(title)s [%(id)s].%(ext)s",
+        **(extra_options or {}),
     }
-    info_list = []
+
+def download_video_with_info(video_url: str, output_directory: str, skip_download: bool = False, extra_options: dict | None = None, metadata_cache: MetadataCache | None = None) -> dict:
+    """Download a single YouTube video with its own YoutubeDL instance and return its metadata.
+
+    If metadata_cache holds the video's info dict, the download is processed from it
+    instead of extracting the metadata again.
+    """
+    ydl_opts = get_download_options(output_directory, skip_download, extra_options)
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        for video_url in video_urls:
-            info = ydl.extract_info(video_url)
-            info_list.append(info)
-    return info_list
+        info = metadata_cache.get(extract_video_id(video_url)) if metadata_cache is not None else None
+        # Comments are only extracted with the metadata, so a cached info dict without them is not enough
+        if info is not None and (not ydl_opts.get('getcomments') or 'comments' in info):
+            return ydl.process_ie_result(info, download=True)
+        return ydl.extract_info(video_url)
 
 def download_best_audio(url: str, output_directory: str) -> None:
     ydl_opts = {
@@ -104,4 +188,26 @@ def download_best_audio(url: str, output_directory: str) -> None:
     }
 
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        ydl.download([url])
\ No newline at end of file
+        ydl.download([url])
+
+# Audio codecs that can be stream-copied into an .m4a file
+M4A_AUDIO_CODECS = ("aac", "alac")
+
+def extract_audio(video_file: str, output_directory: str) -> str:
+    """Extract the audio track of a downloaded video with FFmpeg instead of downloading it again.
+
+    The track is stream-copied into an .m4a file, which keeps the audio stream that was
+    merged into the video without re-encoding it. If its codec cannot be stored in m4a (e.g. opus
+    from a webm fallback format), it is transcoded locally to a 320 kbps mp3, like download_best_audio.
+    Other FFmpeg errors, like a missing FFmpeg or an unreadable video, are raised. Returns the audio file path.
+    """
+    ffmpeg = FFmpegPostProcessor()
+    audio_path = os.path.join(output_directory, os.path.splitext(os.path.basename(video_file))[0])
+    audio_codec = ffmpeg.get_audio_codec(video_file)
+    if audio_codec is None:
+        raise FFmpegPostProcessorError(f"No readable audio stream in {video_file}")
+    if audio_codec in M4A_AUDIO_CODECS:
+        ffmpeg.run_ffmpeg(video_file, f"{audio_path}.m4a", ['-vn', '-c:a', 'copy'])
+        return f"{audio_path}.m4a"
+    ffmpeg.run_ffmpeg(video_file, f"{audio_path}.mp3", ['-vn', '-c:a', 'libmp3lame', '-b:a', '320k'])
+    return f"{audio_path}.mp3"
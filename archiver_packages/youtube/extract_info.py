@@ -1,10 +1,12 @@
 from selectolax.parser import HTMLParser
-from time import sleep
+from asyncio import sleep
 from archiver_packages.utilities.nodriver_utils import slow_scroll, get_nodriver_tab
 from archiver_packages.utilities.file_utils import download_file
-from typing import Callable
+from typing import Awaitable, Callable
+import nodriver as uc
+import requests
 
-async def scrape_info(driver, yt_link: str, delay: Callable[[int], float], split_tabs: bool) -> tuple:
+async def scrape_info(driver, yt_link: str, delay: Callable[[int], float], split_tabs: bool, new_tab: bool = False, before_navigate: Callable[[uc.Tab], Awaitable[None]] | None = None) -> tuple:
     """Scrape YouTube video info and profile image.
 
     Args:
@@ -12,22 +14,26 @@ async def scrape_info(driver, yt_link: str, delay: Callable[[int], float], split
         yt_link (str): The YouTube video link.
         delay (Callable[[int], float]): A callable to introduce delay.
         split_tabs (bool): Whether to split tabs.
+        new_tab (bool): Whether to open the video in a new tab.
+        before_navigate (Callable | None): Awaited with the blank tab before the video is loaded.
     """
     tab = await get_nodriver_tab(
         driver=driver,
         url=yt_link,
         delay=delay,
         add_tab_delay=3,
-        split_tabs=split_tabs
+        split_tabs=split_tabs,
+        new_tab=new_tab,
+        before_navigate=before_navigate
     )
 
     await slow_scroll(tab, delay)
-    sleep(delay() + 5)
+    await sleep(delay() + 5)
 
     try:
         profile_image_ele = await tab.select('yt-img-shadow#avatar')
         await profile_image_ele.scroll_into_view()
-        sleep(delay() + 1)
+        await sleep(delay() + 1)
     except:
         pass
 
@@ -52,13 +58,14 @@ async def scrape_info(driver, yt_link: str, delay: Callable[[int], float], split
 
     return tab, profile_image, comments_status
 
-def download_youtube_thumbnail(info: dict, save_path: str) -> None:
+def download_youtube_thumbnail(info: dict, save_path: str, session: requests.Session | None = None) -> None:
     """Download the YouTube video thumbnail if available.
 
     Args:
         info (dict): The information dictionary containing the thumbnail URL.
         save_path (str): The path to save the downloaded thumbnail.
+        session (requests.Session | None): Session whose pooled connections are used for the download.
     """
     thumbnail_url = info.get('thumbnail')
     if thumbnail_url:
-        download_file(thumbnail_url, save_path)
\ No newline at end of file
+        download_file(thumbnail_url, save_path, session)
\ No newline at end of file
@@ -0,0 +1,76 @@
+import re
+import html
+from functools import cache
+
+VIDEO_TEMPLATE_PATH = "./archiver_packages/youtube_html/index.html"
+
+# Placeholders of the video page template
+VIDEO_TEMPLATE_PLACEHOLDERS = (
+    "REPLACE_TITLE",
+    "TITLE_URL",
+    "NUMBER_OF_VIEWS",
+    "CHANNEL_AUTHOR",
+    "CHANNEL_URL",
+    "PUBLISH_DATE",
+    "CHANNEL_KEYWORDS",
+    "CHANNEL_DESCRIPTION",
+    "CHANNEL_SUBSCRIBERS",
+    "PROFILE_IMAGE_LINK",
+    "LIKE_COUNT",
+    "DISLIKES_COUNT",
+    "COMMENT_COUNT",
+    "VIDEO_SOURCE",
+    "ASSETS_DIR",
+    "STYLES_DIR",
+)
+
+# Placeholders filled with HTML markup, which is inserted without escaping
+VIDEO_TEMPLATE_RAW_PLACEHOLDERS = ("CHANNEL_DESCRIPTION",)
+
+
+class HtmlTemplate:
+    """
+    HTML template compiled once into its static chunks and the placeholder slots between them.
+    Rendering fills every slot in a single pass, so values are never matched against other placeholders.
+    """
+
+    def __init__(self, template: str, placeholders: tuple[str, ...], raw_placeholders: tuple[str, ...] = ()):
+        self.placeholders = set(placeholders)
+        self.raw_placeholders = set(raw_placeholders)
+        # Longest first, so a placeholder that contains another one is matched whole
+        pattern = "|".join(re.escape(placeholder) for placeholder in sorted(placeholders, key=len, reverse=True))
+        parts = re.split(f"({pattern})", template)
+        # re.split alternates static chunks and matched placeholders, starting and ending with a chunk
+        self.chunks = parts[::2]
+        self.slots = parts[1::2]
+
+    def render(self, values: dict[str, str]) -> str:
+        """
+        Render the template.
+
+        Args:
+            values (dict[str, str]): Value of each placeholder, HTML-escaped unless it is a raw placeholder.
+                None values render as empty strings.
+
+        Returns:
+            str: The rendered HTML.
+        """
+        missing = self.placeholders - values.keys()
+        if missing:
+            raise KeyError(f"Missing template values: {', '.join(sorted(missing))}")
+        filled = {}
+        for placeholder, value in values.items():
+            value = "" if value is None else str(value)
+            filled[placeholder] = value if placeholder in self.raw_placeholders else html.escape(value)
+        parts = [self.chunks[0]]
+        for slot, chunk in zip(self.slots, self.chunks[1:]):
+            parts.append(filled[slot])
+            parts.append(chunk)
+        return "".join(parts)
+
+
+@cache
+def load_video_template() -> HtmlTemplate:
+    """Load and compile the video page template, once per process."""
+    with open(VIDEO_TEMPLATE_PATH, "rt", encoding="utf8") as f:
+        return HtmlTemplate(f.read(), VIDEO_TEMPLATE_PLACEHOLDERS, VIDEO_TEMPLATE_RAW_PLACEHOLDERS)
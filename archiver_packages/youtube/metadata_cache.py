@@ -0,0 +1,75 @@
+import os
+import json
+import time
+import logging
+import threading
+
+
+class MetadataCache:
+    """
+    In-process cache of yt-dlp info dicts keyed by video ID, optionally persisted to a JSON file.
+    Entries expire after ttl seconds, as the format URLs in an info dict only stay valid for a few hours.
+    New entries are only written to the file by save, once after the link preview and once after the run.
+    """
+
+    def __init__(self, path: str | None = None, ttl: float = 3600):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries: dict[str, dict] = {}
+        self.dirty = False
+        self.load()
+
+    def load(self) -> None:
+        """Load the unexpired entries of the cache file, if any."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning(f"Could not load metadata cache {self.path}: {e}")
+            return
+        now = time.time()
+        self.entries = {
+            video_id: entry for video_id, entry in entries.items() if now - entry["cached_at"] < self.ttl
+        }
+
+    def save(self) -> None:
+        """Write the cache file if it changed, replacing it atomically."""
+        if not self.path:
+            return
+        with self.lock:
+            if not self.dirty:
+                return
+            entries = dict(self.entries)
+            self.dirty = False
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except (OSError, TypeError) as e:
+            logging.warning(f"Could not save metadata cache {self.path}: {e}")
+
+    def get(self, video_id: str | None) -> dict | None:
+        """Return the cached info dict of a video, or None if missing or expired."""
+        if not video_id:
+            return None
+        with self.lock:
+            entry = self.entries.get(video_id)
+            if entry is None:
+                return None
+            if time.time() - entry["cached_at"] >= self.ttl:
+                del self.entries[video_id]
+                return None
+            return entry["info"]
+
+    def put(self, info: dict) -> None:
+        """Cache a JSON-serialisable info dict under its video ID, to be written to the file by save."""
+        video_id = info.get("id")
+        if not video_id:
+            return
+        with self.lock:
+            self.entries[video_id] = {"cached_at": time.time(), "info": info}
+            self.dirty = True
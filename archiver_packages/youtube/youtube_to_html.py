@@ -1,14 +1,26 @@
 import os, re
+import html
+import asyncio
 import logging
 import traceback
 from archiver_packages.youtube.extract_info import scrape_info, download_youtube_thumbnail
 from archiver_packages.youtube.add_comments import add_comments
+from archiver_packages.youtube.html_template import load_video_template
+from archiver_packages.youtube.comment_sources import COMMENT_CONTINUATION_URL
+from archiver_packages.utilities.nodriver_utils import ResponseRecorder
+from archiver_packages.utilities.process_pool import run_in_process_pool
+from archiver_packages.utilities.metrics import RunMetrics, measure_stage, SCRAPE_INFO, LOCALIZE_IMAGES, AUDIO
+from archiver_packages.utilities.asset_localizer import AssetLocalizer
+from archiver_packages.utilities.archive_index import ArchiveIndex
+from archiver_packages.utilities.journal import ArchiveJournal, SCRAPED, COMMENTS_WRITTEN, AUDIO_EXTRACTED
 from archiver_packages.utilities.utilities import convert_date_format
 from archiver_packages.utilities.file_utils import copy_file_or_directory
-from archiver_packages.youtube.download_video import download_best_audio
+from archiver_packages.youtube.download_video import download_best_audio, extract_audio
 from typing import Callable
 import archiver_packages.youtube_html_elements as youtube_html_elements
 
+HTML_ASSET_FOLDERS = ("assets", "styles")
+
 
 def modify_exctracted_info(yt_url: str, video_publish_date: str, channel_keywords: list, channel_description: str, like_count: int | None, dislike_count: int | None, comment_count: int, comments_status: bool) -> tuple:
     """
@@ -36,8 +48,11 @@ def modify_exctracted_info(yt_url: str, video_publish_date: str, channel_keyword
     channel_keywords = ['#' + i for i in channel_keywords]
     channel_keywords = ' '.join(channel_keywords)
 
+    # Escape the plain-text description, it is inserted into the page as HTML
+    channel_description = html.escape(channel_description or "", quote=False)
+
     # Make description link-clickable
-    channel_description = re.sub(r'http\S+', '<a href="' + "\\g<0>" + '">' + "\\g<0>" + '</a>', channel_description)
+    channel_description = re.sub(r'http[^\s"]+', '<a href="' + "\\g<0>" + '">' + "\\g<0>" + '</a>', channel_description)
 
     # Make hashtags clickable
     description_hashtags = re.findall(r"#\w+", channel_description)
@@ -96,6 +111,20 @@ def get_html_output_dir(video_id: str, root_directory: str) -> str | None:
     return None
 
 
+def copy_html_assets(destination_directory: str) -> None:
+    """
+    Copy the assets and styles folders of the HTML template to a directory.
+    Folders already in the directory are kept, so the copy is done once per directory.
+    """
+    for folder in HTML_ASSET_FOLDERS:
+        if os.path.isdir(os.path.join(destination_directory, folder)):
+            continue
+        try:
+            copy_file_or_directory(f"archiver_packages/youtube_html/{folder}", destination_directory)
+        except Exception as e:
+            logging.error(f"Error copying {folder} to {destination_directory}: {e}\n{traceback.format_exc()}")
+
+
 def move_files_with_extension(src_dir: str, ext: str, dest_folder: str) -> None:
     """
     Move files with a given extension from src_dir to dest_folder.
@@ -114,104 +143,236 @@ def move_files_with_extension(src_dir: str, ext: str, dest_folder: str) -> None:
                 logging.error(f"Error moving {src} to {dst}: {e}\n{traceback.format_exc()}")
 
 
-async def parse_to_html(
+async def video_to_html(
     output_directory: str,
-    yt_urls: list[str],
-    files: list[str],
-    info_list: list[dict],
+    yt_url: str,
+    file: str,
+    info: dict,
     driver,
     delay: Callable[[int], float],
     save_comments: bool,
     max_comments: int,
-    split_tabs: bool
+    split_tabs: bool,
+    new_tab: bool = False,
+    comment_options: dict | None = None,
+    journal: ArchiveJournal | None = None,
+    html_options: dict | None = None,
+    metrics: RunMetrics | None = None,
+    asset_localizer: AssetLocalizer | None = None,
+    archive_index: ArchiveIndex | None = None
 ) -> None:
     """
-    Parse YouTube video information to HTML.
+    Parse the information of a single YouTube video to HTML.
 
     Args:
         output_directory (str): Directory to save the HTML export directories.
-        yt_urls (list[str]): List of YouTube URLs.
-        files (list[str]): List of file paths.
-        info_list (list[dict]): List of video information dictionaries.
+        yt_url (str): YouTube URL.
+        file (str): Path of the downloaded video file.
+        info (dict): Video information dictionary.
         driver: Web driver instance.
         delay (Callable[[int], float]): Delay function.
         save_comments (bool): Whether to save comments.
         max_comments (int): Maximum number of comments to save.
         split_tabs (bool): Whether to split tabs.
+        new_tab (bool): Whether to scrape the video in its own tab, closed when done.
+        comment_options (dict | None): Extra keyword arguments passed to add_comments.
+        journal (ArchiveJournal | None): Journal recording the completed stages, stages it marks as done are skipped.
+        html_options (dict | None): Output options. With "shared_assets", the page uses the assets and
+            styles folders of output_directory instead of its own copies. With "audio_mode" "local", the
+            audio track is extracted from the downloaded video instead of being downloaded again.
+        metrics (RunMetrics | None): Run metrics the stage timings and counters of the video are recorded in.
+        asset_localizer (AssetLocalizer | None): Downloads the remote images of the page next to it, which are
+            hotlinked without it. Its session is also used for the thumbnail.
+        archive_index (ArchiveIndex | None): Index of the archived videos for incremental syncs, the video is
+            added to it once fully archived.
     """
-    for (yt_url, file, info) in zip(yt_urls, files, info_list):
-        filename = os.path.basename(file)
-        # Extract the relevant pieces of information
-        video_title = info.get('title', None)
-        video_views = info.get('view_count', None)
-        video_views = "" if video_views is None else f'{video_views:,}'
-        channel_author = info.get('uploader', None)
-        channel_url = info.get('uploader_url', None)
-        channel_url = "Channel URL not found" if channel_url is None else channel_url
-        video_publish_date = info.get('upload_date', None)
-        channel_keywords = info.get('tags', None)
-        channel_description = info.get('description', None)
-        subscribers = info.get('channel_follower_count', None)
-        subscribers = "" if subscribers is None else f'{subscribers:,} subscribers'
-        like_count = info.get('like_count', None)
-        dislike_count = info.get('dislike_count', None)
-        comment_count = info.get('comment_count', None)
-        comment_count = 0 if comment_count is None else comment_count
-        video_id = info.get("id")
-        html_output_directory = get_html_output_dir(video_id, output_directory)
-        if html_output_directory is None:
-            logging.error(f"Skipping video {video_title} due to missing output directory.")
-            continue
+    filename = os.path.basename(file)
+    # Extract the relevant pieces of information
+    video_title = info.get('title', None)
+    video_views = info.get('view_count', None)
+    video_views = "" if video_views is None else f'{video_views:,}'
+    channel_author = info.get('uploader', None)
+    channel_url = info.get('uploader_url', None)
+    channel_url = "Channel URL not found" if channel_url is None else channel_url
+    video_publish_date = info.get('upload_date', None)
+    channel_keywords = info.get('tags', None)
+    channel_description = info.get('description', None)
+    subscribers = info.get('channel_follower_count', None)
+    subscribers = "" if subscribers is None else f'{subscribers:,} subscribers'
+    like_count = info.get('like_count', None)
+    dislike_count = info.get('dislike_count', None)
+    comment_count = info.get('comment_count', None)
+    comment_count = 0 if comment_count is None else comment_count
+    video_id = info.get("id")
+    html_output_directory = get_html_output_dir(video_id, output_directory)
+    if html_output_directory is None:
+        logging.error(f"Skipping video {video_title} due to missing output directory.")
+        return
+    comment_options = comment_options or {}
+    html_options = html_options or {}
+    # Shared assets are copied once to the archive root, one level above the page
+    assets_prefix = "../" if html_options.get("shared_assets") else ""
+    recorder = None
+    if save_comments and comment_options.get("comment_source") == "network":
+        # Record comment API responses from the first page load on
+        recorder = ResponseRecorder(COMMENT_CONTINUATION_URL)
+    # yt_url is trimmed while rendering, the journal and metrics are keyed by the queued URL
+    queued_url = yt_url
+    video_metrics = metrics.video(queued_url) if metrics is not None else None
+    html_done = journal is not None and journal.is_done(queued_url, SCRAPED) \
+        and (not save_comments or journal.is_done(queued_url, COMMENTS_WRITTEN))
+    if html_done:
+        logging.info(f"HTML file already created for {video_title}, skipping.")
+    else:
+        tab = None
         try:
             # Download thumbnail
-            download_youtube_thumbnail(info, os.path.join(html_output_directory, f"{video_id}_thumbnail.jpg"))
-            with open("./archiver_packages/youtube_html/index.html", 'rt', encoding="utf8") as input_file, \
-                 open(f"{html_output_directory}/YouTube.html", 'wt', encoding="utf8") as output_file:
+            await asyncio.to_thread(
+                download_youtube_thumbnail, info, os.path.join(html_output_directory, f"{video_id}_thumbnail.jpg"),
+                asset_localizer.session if asset_localizer else None
+            )
+            with open(f"{html_output_directory}/YouTube.html", 'wt', encoding="utf8") as output_file:
 
                 # Scrape additional info
-                tab, profile_image, comments_status = await scrape_info(driver, yt_url, delay, split_tabs)
+                with measure_stage(video_metrics, SCRAPE_INFO):
+                    tab, profile_image, comments_status = await scrape_info(
+                        driver, yt_url, delay, split_tabs, new_tab, recorder.start if recorder else None
+                    )
 
                 # Modify extracted info
                 yt_url, video_publish_date, channel_keywords, channel_description, like_count, dislike_count, comment_count_html_str = modify_exctracted_info(
                     yt_url, video_publish_date, channel_keywords, channel_description, like_count, dislike_count, comment_count, comments_status)
-                
-                for line in input_file:
-                    output_file.write(
-                        line.replace('REPLACE_TITLE', video_title)
-                        .replace('TITLE_URL', yt_url)
-                        .replace('NUMBER_OF_VIEWS', video_views)
-                        .replace('CHANNEL_AUTHOR', channel_author)
-                        .replace('CHANNEL_URL', channel_url)
-                        .replace('PUBLISH_DATE', f'{video_publish_date}')
-                        .replace('CHANNEL_KEYWORDS', f'{channel_keywords}')
-                        .replace('CHANNEL_DESCRIPTION', channel_description)
-                        .replace('CHANNEL_SUBSCRIBERS', subscribers)
-                        .replace('PROFILE_IMAGE_LINK', profile_image)
-                        .replace('LIKE_COUNT', like_count)
-                        .replace('DISLIKES_COUNT', dislike_count)
-                        .replace('COMMENT_COUNT', comment_count_html_str)
-                        .replace('VIDEO_SOURCE', f'media-extracted/{filename}')
-                    )
+
+                output_file.write(load_video_template().render({
+                    'REPLACE_TITLE': video_title,
+                    'TITLE_URL': yt_url,
+                    'NUMBER_OF_VIEWS': video_views,
+                    'CHANNEL_AUTHOR': channel_author,
+                    'CHANNEL_URL': channel_url,
+                    'PUBLISH_DATE': f'{video_publish_date}',
+                    'CHANNEL_KEYWORDS': f'{channel_keywords}',
+                    'CHANNEL_DESCRIPTION': channel_description,
+                    'CHANNEL_SUBSCRIBERS': subscribers,
+                    'PROFILE_IMAGE_LINK': profile_image,
+                    'LIKE_COUNT': like_count,
+                    'DISLIKES_COUNT': dislike_count,
+                    'COMMENT_COUNT': comment_count_html_str,
+                    'VIDEO_SOURCE': f'media-extracted/{filename}',
+                    'ASSETS_DIR': f'{assets_prefix}assets',
+                    'STYLES_DIR': f'{assets_prefix}styles',
+                }))
                 if save_comments:
-                    await add_comments(tab, html_output_directory, profile_image, comment_count, channel_author, output_file, delay, max_comments)
+                    await add_comments(
+                        tab, html_output_directory, profile_image, comment_count, channel_author, output_file, delay, max_comments,
+                        recorder=recorder, video_url=yt_url, info_comments=info.get("comments"), metrics=video_metrics,
+                        **comment_options
+                    )
+                    if journal:
+                        journal.record(queued_url, COMMENTS_WRITTEN)
                 output_file.write(youtube_html_elements.ending.html_end)
                 logging.info(f"HTML file created for {video_title}")
+            if asset_localizer is not None:
+                with measure_stage(video_metrics, LOCALIZE_IMAGES):
+                    await asyncio.to_thread(
+                        asset_localizer.localize_html, os.path.join(html_output_directory, "YouTube.html")
+                    )
         except Exception as e:
             logging.error(f"Error processing video {video_title}: {e}\n{traceback.format_exc()}")
-            continue
+            return
+        finally:
+            if new_tab and tab is not None:
+                try:
+                    await tab.close()
+                except Exception as e:
+                    logging.warning(f"Could not close tab for {video_title}: {e}")
         # Copy assets and styles folders to html output dir
-        for folder in ["assets", "styles"]:
-            try:
-                copy_file_or_directory(
-                    f"archiver_packages/youtube_html/{folder}",
-                    html_output_directory
-                )
-            except Exception as e:
-                logging.error(f"Error copying {folder} to {html_output_directory}: {e}\n{traceback.format_exc()}")
+        if not html_options.get("shared_assets"):
+            copy_html_assets(html_output_directory)
         # Move .json and .mp4 files using helper
         move_files_with_extension(html_output_directory, ".json", os.path.join(html_output_directory, "data-extracted"))
         move_files_with_extension(html_output_directory, ".mp4", os.path.join(html_output_directory, "media-extracted"))
-        try:
-            download_best_audio(yt_url, os.path.join(html_output_directory, "media-extracted"))
-        except Exception as e:
-            logging.error(f"Error downloading best audio for {video_title}: {e}\n{traceback.format_exc()}")
\ No newline at end of file
+        if journal:
+            journal.record(queued_url, SCRAPED)
+    if journal and journal.is_done(queued_url, AUDIO_EXTRACTED):
+        return
+    media_directory = os.path.join(html_output_directory, "media-extracted")
+    try:
+        with measure_stage(video_metrics, AUDIO):
+            if html_options.get("audio_mode", "download") == "local":
+                await run_in_process_pool(extract_audio, os.path.join(media_directory, filename), media_directory)
+            else:
+                await run_in_process_pool(download_best_audio, yt_url.split("&")[0], media_directory)
+    except Exception as e:
+        logging.error(f"Error extracting audio for {video_title}: {e}\n{traceback.format_exc()}")
+        return
+    # Only fully archived videos are skipped by incremental syncs, the ID is indexed before the last stage is journaled
+    if archive_index is not None:
+        archive_index.add(video_id)
+    if journal:
+        journal.record(queued_url, AUDIO_EXTRACTED)
+
+
+async def parse_to_html(
+    output_directory: str,
+    yt_urls: list[str],
+    files: list[str],
+    info_list: list[dict],
+    driver,
+    delay: Callable[[int], float],
+    save_comments: bool,
+    max_comments: int,
+    split_tabs: bool,
+    max_tabs: int = 1,
+    comment_options: dict | None = None,
+    journal: ArchiveJournal | None = None,
+    html_options: dict | None = None,
+    metrics: RunMetrics | None = None,
+    asset_localizer: AssetLocalizer | None = None,
+    dedicated_tabs: bool = False,
+    archive_index: ArchiveIndex | None = None
+) -> None:
+    """
+    Parse YouTube video information to HTML.
+
+    Args:
+        output_directory (str): Directory to save the HTML export directories.
+        yt_urls (list[str]): List of YouTube URLs.
+        files (list[str]): List of file paths.
+        info_list (list[dict]): List of video information dictionaries.
+        driver: Web driver instance.
+        delay (Callable[[int], float]): Delay function.
+        save_comments (bool): Whether to save comments.
+        max_comments (int): Maximum number of comments to save.
+        split_tabs (bool): Whether to split tabs.
+        max_tabs (int): Maximum number of videos scraped at once, each in its own tab.
+        comment_options (dict | None): Extra keyword arguments passed to add_comments.
+        journal (ArchiveJournal | None): Journal recording the completed stages of each video.
+        html_options (dict | None): Output options passed to video_to_html.
+        metrics (RunMetrics | None): Run metrics the stage timings and counters of each video are recorded in.
+        asset_localizer (AssetLocalizer | None): Downloads the remote images of each page next to it.
+        dedicated_tabs (bool): Scrape every video in its own tab, closed when done, also with max_tabs 1,
+            so the tabs of an attached browser are left alone.
+        archive_index (ArchiveIndex | None): Index of the archived videos for incremental syncs.
+    """
+    if max_tabs <= 1:
+        for (yt_url, file, info) in zip(yt_urls, files, info_list):
+            await video_to_html(
+                output_directory, yt_url, file, info, driver, delay, save_comments, max_comments, split_tabs,
+                new_tab=dedicated_tabs, comment_options=comment_options, journal=journal, html_options=html_options,
+                metrics=metrics, asset_localizer=asset_localizer, archive_index=archive_index
+            )
+        return
+
+    tab_slots = asyncio.Semaphore(max_tabs)
+
+    async def video_to_html_in_tab(yt_url: str, file: str, info: dict) -> None:
+        async with tab_slots:
+            await video_to_html(
+                output_directory, yt_url, file, info, driver, delay, save_comments, max_comments, split_tabs,
+                new_tab=True, comment_options=comment_options, journal=journal, html_options=html_options,
+                metrics=metrics, asset_localizer=asset_localizer, archive_index=archive_index
+            )
+
+    await asyncio.gather(*(
+        video_to_html_in_tab(yt_url, file, info) for (yt_url, file, info) in zip(yt_urls, files, info_list)
+    ))
@@ -0,0 +1,118 @@
+# Synthetic watch page fixtures for the offline benchmarks
+import os
+import random
+
+FIXTURES_DIRECTORY = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# Number of comment threads of the benchmarked watch pages
+PAGE_SIZES = (100, 1000, 10000)
+
+EMOJI_URLS = (
+    "https://www.youtube.com/s/gaming/emoji/7ff574f2/emoji_u1f525.png",
+    "https://www.youtube.com/s/gaming/emoji/7ff574f2/emoji_u1f602.png",
+    "https://www.youtube.com/s/gaming/emoji/7ff574f2/emoji_u2764.png",
+)
+
+WORDS = (
+    "great", "video", "thanks", "for", "sharing", "this", "the", "part", "about", "was", "really",
+    "helpful", "I", "never", "knew", "that", "#tutorial", "amazing", "editing", "love", "it",
+)
+
+
+def comment_text_html(rng: random.Random, video_id: str, mention: str | None = None) -> str:
+    """Return the #content-text HTML of a comment with words, links, timestamps and emoji."""
+    parts = [f'<a class="yt-simple-endpoint" href="/channel/UC{mention}">@{mention}</a>'] if mention else []
+    for _ in range(rng.randint(5, 40)):
+        roll = rng.random()
+        if roll < 0.04:
+            url = f"https://example.com/{rng.randint(0, 9999)}"
+            parts.append(f'<a class="yt-simple-endpoint" href="https://www.youtube.com/redirect?q={url}">{url}</a>')
+        elif roll < 0.08:
+            minutes, seconds = rng.randint(0, 59), rng.randint(0, 59)
+            parts.append(
+                f'<a class="yt-simple-endpoint" href="/watch?v={video_id}&amp;t={minutes * 60 + seconds}s">'
+                f'{minutes}:{seconds:02d}</a>'
+            )
+        elif roll < 0.12:
+            parts.append(f'<img class="small-emoji emoji" src="{rng.choice(EMOJI_URLS)}" alt="emoji">')
+        elif roll < 0.13:
+            parts.append("&lt;b&gt;")
+        else:
+            parts.append(rng.choice(WORDS))
+    return f'<span id="content-text" class="yt-core-attributed-string">{" ".join(parts)}</span>'
+
+
+def comment_body_html(rng: random.Random, video_id: str, username: str, mention: str | None = None) -> str:
+    """Return the #body HTML of a comment or reply."""
+    heart = '<div id="creator-heart-button"></div>' if rng.random() < 0.05 else ""
+    return (
+        f'<div id="body"><div id="author-thumbnail"><yt-img-shadow>'
+        f'<img id="img" src="https://yt3.ggpht.com/{username}=s88-c-k-c0x00ffffff-no-rj"></yt-img-shadow></div>'
+        f'<div id="main"><div id="header"><a href="/@{username}">avatar</a></div>'
+        f'<div id="header-author"><a id="author-text" href="/@{username}">@{username}</a>'
+        f'<span id="published-time-text"><a href="/watch?v={video_id}&amp;lc=x">{rng.randint(1, 11)} months ago</a></span></div>'
+        f'{comment_text_html(rng, video_id, mention)}'
+        f'<div id="toolbar"><span id="vote-count-middle"> {rng.randint(0, 25000):,} </span>{heart}</div></div></div>'
+    )
+
+
+def comment_thread_html(rng: random.Random, video_id: str, index: int) -> str:
+    """Return the HTML of a ytd-comment-thread-renderer with its expanded replies."""
+    username = f"user{index}"
+    pinned = "<ytd-pinned-comment-badge-renderer></ytd-pinned-comment-badge-renderer>" if index == 0 else ""
+    reply_count = rng.choice((0, 0, 0, 1, 2, 3, 5, 12))
+    replies = ""
+    if reply_count:
+        reply_bodies = "".join(
+            comment_body_html(rng, video_id, f"replier{index}_{reply}", username if rng.random() < 0.5 else None)
+            for reply in range(reply_count)
+        )
+        replies = (
+            f'<div id="more-replies"><button aria-label="{reply_count} replies">{reply_count} replies</button></div>'
+            f'<div id="expander"><div id="expander-contents">{reply_bodies}</div></div>'
+        )
+    return f"<ytd-comment-thread-renderer>{pinned}{comment_body_html(rng, video_id, username)}{replies}</ytd-comment-thread-renderer>"
+
+
+def generate_watch_page(thread_count: int, seed: int = 0) -> str:
+    """Return a deterministic watch page with thread_count rendered and expanded comment threads."""
+    rng = random.Random(seed)
+    video_id = "dQw4w9WgXcQ"
+    threads = "".join(comment_thread_html(rng, video_id, index) for index in range(thread_count))
+    return (
+        "<!DOCTYPE html><html><head><title>Benchmark video - YouTube</title></head><body>"
+        f'<ytd-comments id="comments"><div id="contents">{threads}</div></ytd-comments></body></html>'
+    )
+
+
+def load_watch_page(thread_count: int) -> str:
+    """Return the saved watch page fixture with thread_count comment threads, generating it on first use."""
+    path = os.path.join(FIXTURES_DIRECTORY, f"watch_page_{thread_count}.html")
+    if not os.path.exists(path):
+        os.makedirs(FIXTURES_DIRECTORY, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(generate_watch_page(thread_count))
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def video_info() -> dict:
+    """Return the extracted information of a video with a long description, as passed to modify_exctracted_info."""
+    rng = random.Random(0)
+    lines = []
+    for line in range(120):
+        minutes, seconds = divmod(line * 37, 60)
+        lines.append(
+            f"{minutes}:{seconds:02d} {' '.join(rng.choice(WORDS) for _ in range(8))} "
+            f"https://example.com/chapter/{line} #chapter{line}"
+        )
+    return {
+        "yt_url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=42s",
+        "video_publish_date": "20240101",
+        "channel_keywords": [f"keyword{keyword}" for keyword in range(30)],
+        "channel_description": "\n".join(lines),
+        "like_count": 123456,
+        "dislike_count": 789,
+        "comment_count": 10000,
+        "comments_status": True,
+    }
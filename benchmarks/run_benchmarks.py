@@ -0,0 +1,156 @@
+# Offline microbenchmarks of the comment parsing and HTML rendering hot paths
+#
+# Usage, from the repository root:
+#   python -m benchmarks.run_benchmarks --save-baseline benchmarks/baseline.json
+#   python -m benchmarks.run_benchmarks --compare benchmarks/baseline.json
+import os
+import sys
+import json
+import timeit
+import logging
+import argparse
+import platform
+import tracemalloc
+from contextlib import redirect_stdout
+from typing import Callable
+from selectolax.parser import HTMLParser
+from archiver_packages.youtube.add_comments import (
+    COMMENT_THREAD_SELECTOR,
+    parse_comment_text,
+    parse_comments,
+    parse_comment_thread,
+    style_reply_mention,
+)
+from archiver_packages.youtube.extract_comment_emoji import convert_youtube_emoji_url_to_emoji
+from archiver_packages.youtube.html_template import load_video_template, VIDEO_TEMPLATE_PLACEHOLDERS
+from archiver_packages.youtube.youtube_to_html import modify_exctracted_info
+from benchmarks.fixtures import PAGE_SIZES, load_watch_page, video_info
+
+REPLY_BODY_SELECTOR = 'div[id="expander"] div[id="expander-contents"] #body'
+
+
+def measure(func: Callable, items: list, repeat: int) -> dict:
+    """
+    Measure func over every item: best time of repeat runs, then allocations of one traced run.
+
+    Returns:
+        dict: items, items_per_second, peak_bytes (peak traced memory of a run) and
+            allocated_blocks (memory blocks still allocated after a run).
+    """
+    def run() -> None:
+        for item in items:
+            func(item)
+
+    timer = timeit.Timer(run)
+    number, elapsed = timer.autorange()
+    best = min([elapsed] + timer.repeat(repeat=repeat - 1, number=number)) / number
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    run()
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated_blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    return {
+        "items": len(items),
+        "items_per_second": len(items) / best if best else float("inf"),
+        "peak_bytes": peak_bytes,
+        "allocated_blocks": allocated_blocks,
+    }
+
+
+def page_benchmarks(thread_count: int) -> dict[str, tuple[Callable, list]]:
+    """Return the benchmarked functions and their inputs for the watch page with thread_count comment threads."""
+    page = HTMLParser(load_watch_page(thread_count))
+    threads = page.css(COMMENT_THREAD_SELECTOR)
+    bodies = page.css("#body")
+    replies = page.css(REPLY_BODY_SELECTOR)
+    emoji_urls = [img.attributes.get("src") for img in page.css("#content-text img")]
+    styled_replies = [parse_comment_text(reply)[1] for reply in replies]
+    thread_htmls = [thread.html for thread in threads]
+    return {
+        "parse_comment_text": (parse_comment_text, bodies),
+        "parse_comments": (parse_comments, bodies),
+        "style_reply_mention": (style_reply_mention, styled_replies),
+        "convert_youtube_emoji_url_to_emoji": (convert_youtube_emoji_url_to_emoji, emoji_urls),
+        "parse_comment_thread": (
+            lambda thread_html: parse_comment_thread(thread_html, 2, len(thread_htmls)), thread_htmls
+        ),
+    }
+
+
+def video_benchmarks() -> dict[str, tuple[Callable, list]]:
+    """Return the benchmarked per-video functions and their inputs."""
+    info = video_info()
+    template = load_video_template()
+    values = {placeholder: placeholder.lower() for placeholder in VIDEO_TEMPLATE_PLACEHOLDERS}
+    values["CHANNEL_DESCRIPTION"] = info["channel_description"]
+    return {
+        "modify_exctracted_info": (lambda info: modify_exctracted_info(**info), [info]),
+        "render_video_template": (template.render, [values]),
+    }
+
+
+def run_benchmarks(sizes: list[int], repeat: int) -> dict[str, dict]:
+    """Run every benchmark and return the results by benchmark name."""
+    results = {}
+    benchmarks = [(name, case) for name, case in video_benchmarks().items()]
+    for size in sizes:
+        benchmarks += [(f"{name}[{size}]", case) for name, case in page_benchmarks(size).items()]
+    for name, (func, items) in benchmarks:
+        # The parsers print and log debug output for every comment, which is not what is measured
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            result = results[name] = measure(func, items, repeat)
+        print(
+            f"{name:<45} {result['items_per_second']:>14,.0f} items/s"
+            f" {result['peak_bytes'] / 1024:>12,.1f} KiB peak {result['allocated_blocks']:>10,} blocks"
+        )
+    return results
+
+
+def compare_results(results: dict[str, dict], baseline: dict[str, dict], threshold: float) -> list[str]:
+    """Return the regressions of results against baseline, beyond the relative threshold."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        speed = result["items_per_second"] / base["items_per_second"]
+        if speed < 1 - threshold:
+            regressions.append(f"{name}: {1 - speed:.0%} slower")
+        if base["peak_bytes"] and result["peak_bytes"] / base["peak_bytes"] > 1 + threshold:
+            regressions.append(f"{name}: peak memory {result['peak_bytes'] / base['peak_bytes'] - 1:.0%} higher")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run the offline comment parsing and HTML rendering benchmarks.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(PAGE_SIZES), help="Comment threads per watch page")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per benchmark, the best one is kept")
+    parser.add_argument("--save-baseline", metavar="FILE", help="Save the results as a baseline JSON file")
+    parser.add_argument("--compare", metavar="FILE", help="Compare the results with a baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative change reported as a regression")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    results = run_benchmarks(args.sizes, args.repeat)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({"python": platform.python_version(), "results": results}, f, indent=4)
+        print(f"Baseline saved to {args.save_baseline}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare_results(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print("No regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+import os
+import pytest
+from archiver_packages.youtube.add_comments import parse_comment_thread
+
+FIXTURES_DIRECTORY = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+@pytest.fixture
+def dom_thread():
+    with open(os.path.join(FIXTURES_DIRECTORY, "comment_thread.html"), encoding="utf-8") as f:
+        thread, failed_comments = parse_comment_thread(f.read(), 1, 1)
+    assert failed_comments == []
+    return thread
+
+
+def test_dom_thread_fields(dom_thread):
+    comment_dict, _, styled_replies, is_comment_pinned, reply_count = dom_thread
+    assert comment_dict["channel_username"] == "@creator"
+    assert comment_dict["like_count"] == "1.2K"
+    assert comment_dict["comment_date"] == "2 days ago"
+    assert comment_dict["channel_pfp"] == "https://yt3.ggpht.com/creator=s48-c-k-c0x00ffffff-no-rj"
+    assert is_comment_pinned is True
+    assert reply_count == "1 reply"
+    assert [reply["channel_username"] for reply in comment_dict["replies"]] == ["@fan"]
+    assert comment_dict["replies"][0]["author_heart"] is True
+    assert styled_replies[0].startswith('<span style="color: #3EA6FF;">@creator</span>')
+
+
+def test_dom_links_are_styled(dom_thread):
+    comment_dict, styled_text, styled_replies, _, _ = dom_thread
+    assert comment_dict["text"].split()[:5] == ["Chapters", "1:05", "<b>", "🔥", "https://example.com/1"]
+    assert '<a href="https://www.youtube.com//watch?v=dQw4w9WgXcQ&amp;t=65s">' in styled_text
+    assert '<a href="https://example.com/1"><span style="color: #3EA6FF;">https://example.com/1</span></a>' in styled_text
+    assert '<a href="https://www.youtube.com//watch?v=dQw4w9WgXcQ&amp;t=3723s">' in styled_replies[0]
+
+
+def test_dom_link_text_and_href_are_escaped(dom_thread):
+    _, styled_text, _, _, _ = dom_thread
+    assert "&lt;b&gt;" in styled_text
+    assert "<script>" not in styled_text and "<i>" not in styled_text
+    assert 'href="https://x.com/&quot;&gt;&lt;script&gt;alert(1)&lt;/script&gt;"' in styled_text
+    assert 't=1s&quot;&gt;&lt;script&gt;alert(2)&lt;/script&gt;"' in styled_text
@@ -0,0 +1,77 @@
+import os
+import pytest
+from archiver_packages.utilities.asset_localizer import AssetLocalizer, IMAGES_DIRECTORY
+
+
+@pytest.fixture
+def localizer():
+    localizer = AssetLocalizer(max_workers=2)
+    yield localizer
+    localizer.close()
+
+
+def write_page(directory, lines: list[str]) -> str:
+    html_path = os.path.join(directory, "YouTube.html")
+    with open(html_path, "w", encoding="utf8") as f:
+        f.write("\n".join(lines) + "\n")
+    return html_path
+
+
+def read_lines(html_path: str) -> list[str]:
+    with open(html_path, encoding="utf8") as f:
+        return f.read().splitlines()
+
+
+def test_rewrites_remote_images_to_local_files(tmp_path, image_server, localizer):
+    _, base = image_server
+    html_path = write_page(tmp_path, [
+        f'<div><img src="{base}/avatar=s48-c-k?a=1&amp;b=2" alt="Avatar"></div>',
+        f'<img src="{base}/owner=s48-c-k" alt="Channel owner reaction">',
+        '<img class="search-icon" src="assets/icons/search.svg">',
+    ])
+
+    assert localizer.localize_html(html_path) == 2
+
+    lines = read_lines(html_path)
+    assert lines[2] == '<img class="search-icon" src="assets/icons/search.svg">'
+    for line, path in zip(lines, ("/avatar=s48-c-k?a=1&b=2", "/owner=s48-c-k")):
+        src = line.split('src="')[1].split('"')[0]
+        assert src.startswith(f"{IMAGES_DIRECTORY}/") and src.endswith(".png")
+        with open(tmp_path / src, "rb") as f:
+            assert f.read() == b"\x89PNG" + path.encode()
+
+
+def test_duplicate_urls_are_downloaded_once(tmp_path, image_server, localizer):
+    server, base = image_server
+    html_path = write_page(tmp_path, [f'<img src="{base}/same" alt="Avatar">'] * 5)
+
+    assert localizer.localize_html(html_path) == 1
+
+    assert [path for path, _ in server.requests] == ["/same"]
+    assert len(set(read_lines(html_path))) == 1
+    assert len(os.listdir(tmp_path / IMAGES_DIRECTORY)) == 1
+
+
+def test_failed_fetch_keeps_remote_url(tmp_path, image_server, localizer):
+    _, base = image_server
+    missing = f'<img src="{base}/missing" alt="Avatar">'
+    html_path = write_page(tmp_path, [missing, f'<img src="{base}/found" alt="Avatar">'])
+
+    assert localizer.localize_html(html_path) == 1
+
+    lines = read_lines(html_path)
+    assert lines[0] == missing
+    assert lines[1].startswith(f'<img src="{IMAGES_DIRECTORY}/')
+
+
+def test_connections_are_pooled_across_pages(tmp_path, image_server, localizer):
+    server, base = image_server
+    for page in range(3):
+        page_directory = tmp_path / str(page)
+        page_directory.mkdir()
+        html_path = write_page(page_directory, [f'<img src="{base}/{page}/{image}">' for image in range(10)])
+        assert localizer.localize_html(html_path) == 10
+
+    assert len(server.requests) == 30
+    # 30 downloads by at most 2 workers reuse the kept-alive connections of the session
+    assert len({client_address for _, client_address in server.requests}) <= 2
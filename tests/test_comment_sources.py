@@ -0,0 +1,118 @@
+import os
+import json
+import pytest
+from archiver_packages.youtube.comment_sources import parse_comment_responses, parse_info_comments, style_comment_text
+from archiver_packages.youtube.add_comments import comment_thread_html
+
+FIXTURES_DIRECTORY = os.path.join(os.path.dirname(__file__), "fixtures")
+VIDEO_URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+
+def load_fixture(filename: str):
+    with open(os.path.join(FIXTURES_DIRECTORY, filename), encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def response_threads():
+    return parse_comment_responses([load_fixture("comment_next_response.json")], VIDEO_URL)
+
+
+@pytest.fixture
+def info_threads():
+    return parse_info_comments(load_fixture("info_comments.json"), VIDEO_URL)
+
+
+def test_responses_threads_in_order(response_threads):
+    assert [thread[0]["channel_username"] for thread in response_threads] == ["@creator", "@viewer"]
+
+
+def test_responses_comment_dict(response_threads):
+    comment_dict, styled_text, styled_replies, is_comment_pinned, reply_count = response_threads[0]
+    assert comment_dict["text"] == "Chapters: 1:05 intro <b>"
+    assert comment_dict["like_count"] == "1.2K"
+    assert comment_dict["comment_date"] == "2 days ago"
+    assert comment_dict["channel_url"] == "https://www.youtube.com/@creator"
+    assert comment_dict["channel_pfp"] == "https://yt3.ggpht.com/creator=s48-c-k-c0x00ffffff-no-rj"
+    assert comment_dict["author_heart"] is False
+    assert is_comment_pinned is True
+    assert reply_count == "1 reply"
+    # Text is escaped and timestamps link to the video
+    assert "&lt;b&gt;" in styled_text
+    assert f'href="{VIDEO_URL}&amp;t=65s"' in styled_text
+
+
+def test_responses_replies_threaded_by_comment_id(response_threads):
+    comment_dict, _, styled_replies, _, _ = response_threads[0]
+    assert [reply["text"] for reply in comment_dict["replies"]] == ["@creator thanks!"]
+    assert comment_dict["replies"][0]["author_heart"] is True
+    assert styled_replies[0].startswith('<span style="color: #3EA6FF;">@creator</span>')
+
+
+def test_responses_unpinned_hearted_comment_without_replies(response_threads):
+    comment_dict, styled_text, styled_replies, is_comment_pinned, reply_count = response_threads[1]
+    assert styled_text == "Great video"
+    assert comment_dict["author_heart"] is True
+    assert comment_dict["channel_url"] == "https://www.youtube.com/channel/UCviewer"
+    assert comment_dict["replies"] == [] and styled_replies == []
+    assert is_comment_pinned is False
+    assert reply_count is None
+
+
+def test_info_comments_threads(info_threads):
+    assert len(info_threads) == 2
+    comment_dict, styled_text, styled_replies, is_comment_pinned, reply_count = info_threads[0]
+    assert comment_dict["text"] == "Chapters: 1:05 intro"
+    assert comment_dict["like_count"] == "1,200"
+    assert comment_dict["author_heart"] is False
+    assert is_comment_pinned is True
+    assert reply_count == "1 reply"
+    assert f'href="{VIDEO_URL}&amp;t=65s"' in styled_text
+    assert [reply["channel_username"] for reply in comment_dict["replies"]] == ["@fan"]
+    assert comment_dict["replies"][0]["author_heart"] is True
+    assert styled_replies[0].startswith('<span style="color: #3EA6FF;">@creator</span>')
+
+
+def test_info_comments_without_time_text(info_threads):
+    comment_dict, _, _, is_comment_pinned, reply_count = info_threads[1]
+    assert comment_dict["comment_date"] == "01 January 2024"
+    assert comment_dict["like_count"] == ""
+    assert comment_dict["author_heart"] is True
+    assert comment_dict["channel_url"] == "https://www.youtube.com/channel/UCviewer"
+    assert is_comment_pinned is False
+    assert reply_count is None
+
+
+def test_url_cannot_break_out_of_href():
+    styled_text = style_comment_text('see https://x.com/"onmouseover="alert(1) <script>', VIDEO_URL)
+    assert styled_text.startswith('see <a href="https://x.com/">')
+    assert 'onmouseover="alert(1)' not in styled_text.split("</a>")[0]
+    assert "<script>" not in styled_text
+
+
+def test_invalid_timestamps_are_not_linked():
+    styled_text = style_comment_text("12:30:99 1:75 1:02:03", VIDEO_URL)
+    assert styled_text.startswith("12:30:99 1:75 ")
+    assert styled_text.count("<a ") == 1
+    assert f'href="{VIDEO_URL}&amp;t=3723s"' in styled_text
+
+
+def test_rendered_comment_fields_are_escaped():
+    comment = {
+        "id": "UgxEvil",
+        "parent": "root",
+        "text": "hi",
+        "author": "<img src=x onerror=alert(1)>",
+        "author_url": 'https://www.youtube.com/@evil"><script>alert(1)</script>',
+        "author_thumbnail": 'https://yt3.ggpht.com/evil" onerror="alert(1)',
+        "_time_text": "<b>now</b>",
+        "is_favorited": True,
+    }
+    reply = dict(comment, id="UgxEvil.reply", parent="UgxEvil")
+    thread_html = comment_thread_html(
+        parse_info_comments([comment, reply], VIDEO_URL)[0], 'https://yt3.ggpht.com/owner" onload="x', "<i>Owner</i>"
+    )
+    assert "<img src=x" not in thread_html
+    assert "<script>" not in thread_html and "<b>now" not in thread_html
+    assert '" onerror=' not in thread_html and '" onload=' not in thread_html
+    assert thread_html.count("&lt;img src=x onerror=alert(1)&gt;") == 2
@@ -0,0 +1,67 @@
+import pytest
+from archiver_packages.youtube.download_video import expand_youtube_links, iter_youtube_links_from_playlist_and_channel
+
+CHANNEL_URL = "https://www.youtube.com/@channel"
+PLAYLIST_URL = "https://www.youtube.com/watch?v=v1&list=PL1"
+
+
+class FakeExtractor:
+    """yt-dlp compatible extract_info over flat listings, recording how many entries were listed."""
+
+    def __init__(self, listings: dict[str, list[dict]]):
+        self.listings = listings
+        self.listed = []
+
+    def extract_info(self, url, download=False, process=False):
+        assert download is False and process is False
+        return {"_type": "playlist", "entries": self.iter_entries(url)}
+
+    def iter_entries(self, url):
+        for entry in self.listings[url]:
+            self.listed.append(entry.get("id") or entry["url"])
+            yield entry
+
+
+def video(video_id: str) -> dict:
+    return {"_type": "url", "ie_key": "Youtube", "id": video_id, "url": f"https://www.youtube.com/watch?v={video_id}"}
+
+
+def tab(url: str) -> dict:
+    return {"_type": "url", "ie_key": "YoutubeTab", "url": url}
+
+
+@pytest.fixture
+def ydl():
+    return FakeExtractor({
+        CHANNEL_URL: [tab(f"{CHANNEL_URL}/videos"), tab(f"{CHANNEL_URL}/shorts")],
+        f"{CHANNEL_URL}/videos": [video("v3"), video("v2"), video("v1")],
+        f"{CHANNEL_URL}/shorts": [video("s2"), video("s1")],
+        PLAYLIST_URL: [video("p1"), video("p2")],
+    })
+
+
+def test_entries_are_yielded_lazily(ydl):
+    links = iter_youtube_links_from_playlist_and_channel(CHANNEL_URL, ydl=ydl)
+    assert ydl.listed == []
+    assert next(links) == "https://www.youtube.com/watch?v=v3"
+    # The channel tabs are listed, but only the first video of the first tab so far
+    assert ydl.listed == [f"{CHANNEL_URL}/videos", "v3"]
+
+
+def test_links_keep_input_and_listing_order(ydl):
+    links = list(expand_youtube_links(["https://youtu.be/x1", CHANNEL_URL, PLAYLIST_URL], ydl=ydl))
+    assert links[0] == "https://youtu.be/x1"
+    assert [link.split("v=")[1] for link in links[1:]] == ["v3", "v2", "v1", "s2", "s1", "p1", "p2"]
+
+
+def test_stop_at_known_stops_each_channel_tab(ydl):
+    links = list(expand_youtube_links([CHANNEL_URL], known_ids={"v2", "s1"}, ydl=ydl))
+    assert links == ["https://www.youtube.com/watch?v=v3", "https://www.youtube.com/watch?v=s2"]
+    # Listing the videos tab stopped at v2, the shorts tab was still listed
+    assert "v1" not in ydl.listed
+    assert ydl.listed[-2:] == ["s2", "s1"]
+
+
+def test_playlists_skip_known_without_stopping(ydl):
+    links = list(expand_youtube_links([PLAYLIST_URL], known_ids={"p1"}, ydl=ydl))
+    assert links == ["https://www.youtube.com/watch?v=p2"]
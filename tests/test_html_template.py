@@ -0,0 +1,71 @@
+import os
+import pytest
+from archiver_packages.youtube.html_template import (
+    HtmlTemplate,
+    VIDEO_TEMPLATE_PLACEHOLDERS,
+    VIDEO_TEMPLATE_RAW_PLACEHOLDERS,
+)
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), "..", "archiver_packages", "youtube_html", "index.html")
+
+
+@pytest.fixture
+def template_text():
+    with open(TEMPLATE_PATH, encoding="utf8") as f:
+        return f.read()
+
+
+@pytest.fixture
+def video_template(template_text):
+    return HtmlTemplate(template_text, VIDEO_TEMPLATE_PLACEHOLDERS, VIDEO_TEMPLATE_RAW_PLACEHOLDERS)
+
+
+def plain_values() -> dict[str, str]:
+    return {placeholder: f"value of {placeholder.lower()}" for placeholder in VIDEO_TEMPLATE_PLACEHOLDERS}
+
+
+def test_matches_string_replace_output(template_text, video_template):
+    values = plain_values()
+    # The page used to be rendered by chained str.replace calls on every line, in placeholder order
+    expected = []
+    for line in template_text.splitlines(keepends=True):
+        for placeholder in VIDEO_TEMPLATE_PLACEHOLDERS:
+            line = line.replace(placeholder, values[placeholder])
+        expected.append(line)
+    assert video_template.render(values) == "".join(expected)
+
+
+def test_values_are_escaped_except_raw_placeholders():
+    template = HtmlTemplate(
+        '<h1>REPLACE_TITLE</h1><a href="CHANNEL_URL">CHANNEL_DESCRIPTION</a>',
+        ("REPLACE_TITLE", "CHANNEL_URL", "CHANNEL_DESCRIPTION"),
+        ("CHANNEL_DESCRIPTION",),
+    )
+    rendered = template.render({
+        "REPLACE_TITLE": "<script>alert(1)</script>",
+        "CHANNEL_URL": 'https://x.com/" onclick="alert(1)',
+        "CHANNEL_DESCRIPTION": '<a href="https://example.com">link</a>',
+    })
+    assert rendered == (
+        "<h1>&lt;script&gt;alert(1)&lt;/script&gt;</h1>"
+        '<a href="https://x.com/&quot; onclick=&quot;alert(1)"><a href="https://example.com">link</a></a>'
+    )
+
+
+def test_slot_markers_in_values_are_not_substituted(video_template):
+    values = plain_values()
+    values["REPLACE_TITLE"] = "LIKE_COUNT and COMMENT_COUNT"
+    values["CHANNEL_DESCRIPTION"] = "TITLE_URL CHANNEL_AUTHOR"
+    rendered = video_template.render(values)
+    assert "LIKE_COUNT and COMMENT_COUNT" in rendered
+    assert "TITLE_URL CHANNEL_AUTHOR" in rendered
+    assert rendered.count("value of like_count") == video_template.slots.count("LIKE_COUNT")
+
+
+def test_none_renders_empty_and_missing_values_raise(video_template):
+    values = plain_values()
+    values["COMMENT_COUNT"] = None
+    assert "value of comment_count" not in video_template.render(values)
+    del values["LIKE_COUNT"]
+    with pytest.raises(KeyError, match="LIKE_COUNT"):
+        video_template.render(values)
@@ -0,0 +1,112 @@
+import os
+import itertools
+import pytest
+import archiver_packages.utilities.image_cache as image_cache
+from archiver_packages.utilities.asset_localizer import AssetLocalizer, IMAGES_DIRECTORY
+from archiver_packages.utilities.image_cache import ImageCache, normalize_url
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Every cache access gets a later time, so the least recently used order is deterministic
+    ticks = itertools.count(1)
+    monkeypatch.setattr(image_cache.time, "time", lambda: next(ticks))
+
+
+def make_localizer(cache_directory, max_bytes: int = 1024 ** 2) -> AssetLocalizer:
+    return AssetLocalizer(max_workers=2, image_cache=ImageCache(str(cache_directory), max_bytes))
+
+
+def write_page(directory, urls: list[str]) -> str:
+    directory.mkdir(exist_ok=True)
+    html_path = os.path.join(directory, "YouTube.html")
+    with open(html_path, "w", encoding="utf8") as f:
+        f.write("".join(f'<img src="{url}" alt="Avatar">\n' for url in urls))
+    return html_path
+
+
+def local_image_paths(html_path: str) -> list[str]:
+    with open(html_path, encoding="utf8") as f:
+        sources = [line.split('src="')[1].split('"')[0] for line in f]
+    return [os.path.join(os.path.dirname(html_path), src) for src in sources]
+
+
+def test_normalize_url():
+    assert normalize_url("HTTPS://YT3.GoogleUserContent.com/a=s48?b=2&a=1#top") == "https://yt3.ggpht.com/a=s48?a=1&b=2"
+    assert normalize_url(" https://yt3.ggpht.com/a=s48 ") == "https://yt3.ggpht.com/a=s48"
+    # Paths are case-sensitive
+    assert normalize_url("https://yt3.ggpht.com/A") != normalize_url("https://yt3.ggpht.com/a")
+
+
+def test_equivalent_urls_are_downloaded_once_across_runs(tmp_path, image_server):
+    server, base = image_server
+    localizer = make_localizer(tmp_path / "cache")
+    assert localizer.localize_html(write_page(tmp_path / "first", [f"{base}/avatar?a=1&b=2"])) == 1
+    localizer.close()
+
+    # A later run loads the saved index and links the cached image for an equivalent URL
+    localizer = make_localizer(tmp_path / "cache")
+    second_page = write_page(tmp_path / "second", [f"{base}/avatar?b=2&a=1#top"])
+    assert localizer.localize_html(second_page) == 1
+    localizer.close()
+
+    assert [path for path, _ in server.requests] == ["/avatar?a=1&b=2"]
+    with open(local_image_paths(second_page)[0], "rb") as f:
+        assert f.read() == b"\x89PNG/avatar?a=1&b=2"
+
+
+def test_pages_hardlink_cached_blobs(tmp_path, image_server):
+    _, base = image_server
+    localizer = make_localizer(tmp_path / "cache")
+    pages = [write_page(tmp_path / str(page), [f"{base}/same"]) for page in range(2)]
+    for html_path in pages:
+        localizer.localize_html(html_path)
+    localizer.close()
+
+    first, second = (local_image_paths(html_path)[0] for html_path in pages)
+    blob = localizer.image_cache.blob_path(os.path.basename(first))
+    assert os.path.samefile(first, blob) and os.path.samefile(second, blob)
+    assert os.stat(blob).st_nlink == 3
+
+
+def test_blobs_are_copied_where_hardlinks_fail(tmp_path, image_server, monkeypatch):
+    _, base = image_server
+
+    def link(source_path, destination_path):
+        raise OSError("Invalid cross-device link")
+
+    monkeypatch.setattr(image_cache.os, "link", link)
+    localizer = make_localizer(tmp_path / "cache")
+    html_path = write_page(tmp_path / "page", [f"{base}/avatar"])
+    assert localizer.localize_html(html_path) == 1
+    localizer.close()
+
+    image_path = local_image_paths(html_path)[0]
+    assert os.path.basename(os.path.dirname(image_path)) == IMAGES_DIRECTORY
+    assert not os.path.samefile(image_path, localizer.image_cache.blob_path(os.path.basename(image_path)))
+    with open(image_path, "rb") as f:
+        assert f.read() == b"\x89PNG/avatar"
+
+
+def test_least_recently_used_blobs_are_evicted(tmp_path, image_server, clock):
+    server, base = image_server
+    # Every served body is 9 bytes, so the cache holds two images
+    localizer = make_localizer(tmp_path / "cache", max_bytes=18)
+    first_page = write_page(tmp_path / "first", [f"{base}/img1"])
+    localizer.localize_html(first_page)
+    localizer.localize_html(write_page(tmp_path / "second", [f"{base}/img2"]))
+    # Using img1 again makes img2 the least recently used
+    localizer.localize_html(write_page(tmp_path / "third", [f"{base}/img1"]))
+    localizer.localize_html(write_page(tmp_path / "fourth", [f"{base}/img3"]))
+    cache = localizer.image_cache
+    assert sum(entry["size"] for entry in cache.blobs.values()) == 18
+    assert [normalize_url(f"{base}/{path}") in cache.urls for path in ("img1", "img2", "img3")] == [True, False, True]
+    blob_files = [name for _, _, names in os.walk(tmp_path / "cache" / image_cache.BLOBS_DIRECTORY) for name in names]
+    assert sorted(blob_files) == sorted(cache.blobs)
+
+    # The evicted image is downloaded again, its first page keeps its hardlinked copy
+    localizer.localize_html(write_page(tmp_path / "fifth", [f"{base}/img2"]))
+    localizer.close()
+    assert [path for path, _ in server.requests] == ["/img1", "/img2", "/img3", "/img2"]
+    with open(local_image_paths(first_page)[0], "rb") as f:
+        assert f.read() == b"\x89PNG/img1"